@@ -0,0 +1,187 @@
+import os
+import re
+import json
+import time
+import random
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+TERMINAL_STATES = ("SUCCEEDED", "FAILED", "CANCELLED")
+# Only statements that read data are worth reusing; DDL must always run
+CACHEABLE_PREFIXES = ("select", "with", "show", "describe")
+
+
+class AthenaQueryError(Exception):
+    def __init__(self, execution_id, state, reason=""):
+        super().__init__(f"Athena query {execution_id} {state}: {reason}")
+        self.execution_id = execution_id
+        self.state = state
+        self.reason = reason
+
+
+def normalize_sql(sql):
+    """Normalize a query for cache lookups.
+
+    Comments, redundant whitespace, a trailing semicolon and the case of
+    everything outside string literals are ignored.
+    """
+    sql = re.sub(r"--[^\n]*", " ", sql)
+    sql = re.sub(r"/\*.*?\*/", " ", sql, flags=re.S)
+    parts = re.split(r"('(?:[^']|'')*')", sql)
+    parts = [part if i % 2 else re.sub(r"\s+", " ", part.lower()) for i, part in enumerate(parts)]
+    return "".join(parts).strip().rstrip(";").strip()
+
+
+class AthenaQueryManager:
+    """Runs Athena queries, waits for them properly and reuses recent results.
+
+    Completion is checked with get_query_execution, backing off exponentially
+    from initial_delay to max_delay between polls. Read queries are cached by
+    a hash of their normalized SQL and database: a repeated query within
+    cache_ttl seconds reads the earlier execution's results instead of
+    scanning the data again. The cache is kept in memory and, if cache_path
+    is given, in a JSON file.
+
+    athena is a boto3 Athena client or anything with the same methods, such
+    as LocalAthena.
+    """
+
+    def __init__(self, athena, output_location, database="nba_analytics", cache_ttl=3600, cache_path=None,
+                 initial_delay=0.25, max_delay=5.0, timeout=300, max_workers=4, sleep=time.sleep):
+        self.athena = athena
+        self.output_location = output_location
+        self.database = database
+        self.cache_ttl = cache_ttl
+        self.cache_path = cache_path
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.sleep = sleep
+        self.cache_hits = 0
+        self.executions = 0
+        self._cache = {}
+        self._lock = threading.Lock()
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path) as f:
+                    self._cache = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Error loading Athena result cache from {cache_path}: {e}")
+
+    def cache_key(self, sql, database=None):
+        normalized = normalize_sql(sql)
+        return hashlib.sha256(f"{database or self.database}\n{normalized}".encode("utf-8")).hexdigest()
+
+    def _cached_execution(self, key):
+        with self._lock:
+            entry = self._cache.get(key)
+        if entry is not None and time.time() - entry["finished_at"] < self.cache_ttl:
+            return entry["execution_id"]
+        return None
+
+    def _remember(self, key, execution_id):
+        with self._lock:
+            self._cache[key] = {"execution_id": execution_id, "finished_at": time.time()}
+            if not self.cache_path:
+                return
+            # Written under the lock so concurrent queries don't interleave writes
+            tmp_path = f"{self.cache_path}.tmp"
+            try:
+                with open(tmp_path, "w") as f:
+                    json.dump(self._cache, f)
+                os.replace(tmp_path, self.cache_path)
+            except OSError as e:
+                print(f"Error saving Athena result cache to {self.cache_path}: {e}")
+
+    def invalidate(self):
+        """Forget all cached results, e.g. after new data is loaded."""
+        with self._lock:
+            self._cache = {}
+        if self.cache_path and os.path.exists(self.cache_path):
+            os.remove(self.cache_path)
+
+    def start(self, sql, database=None):
+        """Start a query and return its execution id without waiting."""
+        response = self.athena.start_query_execution(
+            QueryString=sql,
+            QueryExecutionContext={"Database": database or self.database},
+            ResultConfiguration={"OutputLocation": self.output_location},
+        )
+        with self._lock:
+            self.executions += 1
+        return response["QueryExecutionId"]
+
+    def wait(self, execution_id):
+        """Poll until the query finishes. Returns its QueryExecution, or raises AthenaQueryError."""
+        deadline = time.monotonic() + self.timeout
+        delay = self.initial_delay
+        while True:
+            execution = self.athena.get_query_execution(QueryExecutionId=execution_id)["QueryExecution"]
+            status = execution["Status"]
+            state = status["State"]
+            if state == "SUCCEEDED":
+                return execution
+            if state in TERMINAL_STATES:
+                raise AthenaQueryError(execution_id, state, status.get("StateChangeReason", ""))
+            if time.monotonic() + delay > deadline:
+                self.athena.stop_query_execution(QueryExecutionId=execution_id)
+                raise AthenaQueryError(execution_id, "TIMED_OUT", f"still {state} after {self.timeout}s")
+            self.sleep(delay * (0.8 + 0.4 * random.random()))
+            delay = min(delay * 2, self.max_delay)
+
+    def execute(self, sql, database=None, use_cache=True):
+        """Run a query to completion and return its execution id, reusing a cached one if possible."""
+        cacheable = use_cache and normalize_sql(sql).startswith(CACHEABLE_PREFIXES)
+        key = self.cache_key(sql, database) if cacheable else None
+        if cacheable:
+            execution_id = self._cached_execution(key)
+            if execution_id is not None:
+                with self._lock:
+                    self.cache_hits += 1
+                return execution_id
+        execution_id = self.start(sql, database)
+        self.wait(execution_id)
+        if cacheable:
+            self._remember(key, execution_id)
+        return execution_id
+
+    def execute_many(self, queries, database=None, use_cache=True):
+        """Run independent queries concurrently. Returns their execution ids in order.
+
+        Every query runs to completion even if another fails; the first
+        failure is raised afterwards.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self.execute, sql, database, use_cache) for sql in queries]
+        errors = [future.exception() for future in futures if future.exception() is not None]
+        if errors:
+            raise errors[0]
+        return [future.result() for future in futures]
+
+    def results(self, execution_id, page_size=1000):
+        """Yield result rows as dicts, fetching one page of get_query_results at a time."""
+        kwargs = {"QueryExecutionId": execution_id, "MaxResults": page_size}
+        columns = None
+        first_page = True
+        while True:
+            page = self.athena.get_query_results(**kwargs)
+            result_set = page["ResultSet"]
+            if columns is None:
+                columns = [column["Name"] for column in result_set["ResultSetMetadata"]["ColumnInfo"]]
+            rows = result_set["Rows"]
+            for i, row in enumerate(rows):
+                values = [datum.get("VarCharValue") for datum in row["Data"]]
+                # SELECT results repeat the column names as the first row
+                if first_page and i == 0 and values == columns:
+                    continue
+                yield dict(zip(columns, values))
+            first_page = False
+            if not page.get("NextToken"):
+                return
+            kwargs["NextToken"] = page["NextToken"]
+
+    def query(self, sql, database=None, use_cache=True, page_size=1000):
+        """Run a query (or reuse a cached result) and yield its rows as dicts."""
+        yield from self.results(self.execute(sql, database, use_cache), page_size)
@@ -0,0 +1,88 @@
+import os
+import json
+import hashlib
+
+KEY_FIELDS = ("PlayerID", "PlayerId", "player_id")
+
+
+def record_key(record):
+    """Return the player key of a record as a string."""
+    for field in KEY_FIELDS:
+        if record.get(field) is not None:
+            return str(record[field])
+    raise KeyError(f"Record has none of the key fields {', '.join(KEY_FIELDS)}")
+
+
+def record_hash(record):
+    return hashlib.sha256(json.dumps(record, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class IngestManifest:
+    """Hashes of the last ingested version of every player, plus the delta
+    files written since the base snapshot was last compacted.
+
+    location is a local file path or an s3:// URL in the data lake bucket.
+    """
+
+    def __init__(self, location, s3=None):
+        self.location = location
+        self.s3 = s3
+        self.players = {}
+        self.deltas = []
+
+    def _s3_location(self):
+        bucket_name, _, key = self.location[len("s3://"):].partition("/")
+        return bucket_name, key
+
+    def load(self):
+        """Load the manifest. Returns False if there is none yet."""
+        try:
+            if self.location.startswith("s3://"):
+                bucket_name, key = self._s3_location()
+                try:
+                    body = self.s3.get_object(Bucket=bucket_name, Key=key)["Body"].read()
+                except self.s3.exceptions.NoSuchKey:
+                    return False
+                manifest = json.loads(body)
+            else:
+                if not os.path.exists(self.location):
+                    return False
+                with open(self.location) as f:
+                    manifest = json.load(f)
+        except ValueError as e:
+            print(f"Error reading ingest manifest {self.location}: {e}")
+            return False
+        self.players = manifest.get("players", {})
+        self.deltas = manifest.get("deltas", [])
+        return True
+
+    def save(self):
+        body = json.dumps({"players": self.players, "deltas": self.deltas})
+        if self.location.startswith("s3://"):
+            bucket_name, key = self._s3_location()
+            self.s3.put_object(Bucket=bucket_name, Key=key, Body=body.encode("utf-8"), ContentType="application/json")
+            return
+        directory = os.path.dirname(self.location)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.location}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(body)
+        os.replace(tmp_path, self.location)
+
+    def diff(self, records):
+        """Compare records with the manifest.
+
+        Returns (changed, removed, hashes): new or changed records, keys of
+        players that are no longer in the feed, and {key: hash} for the feed.
+        """
+        hashes = {}
+        changed = []
+        for record in records:
+            key = record_key(record)
+            digest = record_hash(record)
+            hashes[key] = digest
+            if self.players.get(key) != digest:
+                changed.append(record)
+        removed = [key for key in self.players if key not in hashes]
+        return changed, removed, hashes
@@ -0,0 +1,108 @@
+import re
+import uuid
+import sqlite3
+import threading
+
+# Catalog-only statements that have no SQLite equivalent; they succeed without doing anything
+CATALOG_STATEMENTS = re.compile(r"^\s*(create\s+external\s+table|alter\s+table\s+\S+\s+add|msck\s+repair)", re.I)
+CREATE_DATABASE = re.compile(r"^\s*create\s+(?:database|schema)\s+(?:if\s+not\s+exists\s+)?`?(\w+)`?", re.I)
+
+
+class LocalAthena:
+    """In-process stand-in for the boto3 Athena client, backed by SQLite.
+
+    Supports the calls AthenaQueryManager makes: start_query_execution,
+    get_query_execution, get_query_results (paged, with the header row
+    Athena adds to SELECT results) and stop_query_execution. Each query
+    reports QUEUED/RUNNING for polls_until_done polls before its final
+    state, so polling and backoff can be exercised without AWS.
+
+        athena = LocalAthena()
+        athena.load_table("nba_analytics.player_stats", records)
+        manager = AthenaQueryManager(athena, "s3://unused/", sleep=lambda _: None)
+        rows = list(manager.query("SELECT team, count(*) AS players FROM player_stats GROUP BY team"))
+    """
+
+    def __init__(self, polls_until_done=2):
+        self.polls_until_done = polls_until_done
+        self.scans = 0
+        self._db = sqlite3.connect(":memory:", check_same_thread=False)
+        self._databases = set()
+        self._executions = {}
+        self._lock = threading.Lock()
+
+    def _attach(self, database):
+        if database not in self._databases:
+            self._db.execute(f"ATTACH DATABASE ':memory:' AS {database}")
+            self._databases.add(database)
+
+    def load_table(self, name, records):
+        """Create table name ("database.table") from a list of dicts."""
+        database, _, table = name.rpartition(".")
+        with self._lock:
+            if database:
+                self._attach(database)
+            columns = list(dict.fromkeys(key for record in records for key in record))
+            self._db.execute(f"DROP TABLE IF EXISTS {name}")
+            self._db.execute(f"CREATE TABLE {name} ({', '.join(columns)})")
+            self._db.executemany(
+                f"INSERT INTO {name} VALUES ({', '.join('?' for _ in columns)})",
+                [[record.get(column) for column in columns] for record in records],
+            )
+
+    def _run(self, sql, database):
+        match = CREATE_DATABASE.match(sql)
+        if match:
+            self._attach(match.group(1))
+            return [], []
+        if CATALOG_STATEMENTS.match(sql):
+            return [], []
+        if database:
+            self._attach(database)
+        self.scans += 1
+        cursor = self._db.execute(sql.strip().rstrip(";"))
+        columns = [column[0] for column in cursor.description or []]
+        return columns, cursor.fetchall()
+
+    def start_query_execution(self, QueryString, QueryExecutionContext=None, ResultConfiguration=None, **kwargs):
+        database = (QueryExecutionContext or {}).get("Database")
+        execution_id = str(uuid.uuid4())
+        execution = {"polls": 0, "columns": [], "rows": [], "state": "SUCCEEDED", "reason": ""}
+        with self._lock:
+            try:
+                execution["columns"], execution["rows"] = self._run(QueryString, database)
+            except sqlite3.Error as e:
+                execution["state"] = "FAILED"
+                execution["reason"] = str(e)
+            self._executions[execution_id] = execution
+        return {"QueryExecutionId": execution_id}
+
+    def get_query_execution(self, QueryExecutionId):
+        execution = self._executions[QueryExecutionId]
+        execution["polls"] += 1
+        state = execution["state"]
+        if state not in ("CANCELLED",) and execution["polls"] <= self.polls_until_done:
+            state = "QUEUED" if execution["polls"] == 1 else "RUNNING"
+        return {"QueryExecution": {
+            "QueryExecutionId": QueryExecutionId,
+            "Status": {"State": state, "StateChangeReason": execution["reason"]},
+        }}
+
+    def stop_query_execution(self, QueryExecutionId):
+        self._executions[QueryExecutionId]["state"] = "CANCELLED"
+        return {}
+
+    def get_query_results(self, QueryExecutionId, MaxResults=1000, NextToken=None):
+        execution = self._executions[QueryExecutionId]
+        columns = execution["columns"]
+        rows = [list(columns)] + [list(row) for row in execution["rows"]] if columns else []
+        start = int(NextToken or 0)
+        page = rows[start:start + MaxResults]
+        response = {"ResultSet": {
+            "ResultSetMetadata": {"ColumnInfo": [{"Name": column} for column in columns]},
+            # Athena leaves VarCharValue out for NULLs
+            "Rows": [{"Data": [{} if value is None else {"VarCharValue": str(value)} for value in row]} for row in page],
+        }}
+        if start + MaxResults < len(rows):
+            response["NextToken"] = str(start + MaxResults)
+        return response
@@ -1,11 +1,20 @@
 import boto3
+import gzip
 import json
 import time
 import requests
 from dotenv import load_dotenv
 import os
+from datetime import date, datetime, timezone
+from s3_stream_writer import S3StreamWriter
+from ingest_manifest import IngestManifest, record_key
+from athena_query_manager import AthenaQueryManager
+import parquet_writer
 
 load_dotenv()
+def sql_string(value):
+    """Escape a value for use inside a single-quoted SQL literal."""
+    return str(value).replace("'", "''")
 class DataLake:
     def __init__(self):
         self.region = os.getenv("AWS_REGION")
@@ -14,11 +23,39 @@ class DataLake:
         self.athena_output_location = f"s3://{self.bucket_name}/athena-results/"
         self.sports_data_api_key = os.getenv("NBA_API_KEY")
         self.nba_endpoint = os.getenv("NBA_ENDPOINT")
+        self.raw_data_key = "raw-data/nba_player_data.json.gz"
+        self.upload_part_size = int(os.getenv("UPLOAD_PART_SIZE", 8 * 1024 * 1024))
+        self.upload_workers = int(os.getenv("UPLOAD_WORKERS", 4))
+        # "json" (gzip NDJSON) or "parquet" (partitioned by season and team)
+        self.output_format = os.getenv("OUTPUT_FORMAT", "json").lower()
+        self.parquet_compression = os.getenv("PARQUET_COMPRESSION", "snappy").lower()
+        self.parquet_prefix = "curated/player_stats"
+        self.parquet_table = "nba_analytics.player_stats_parquet"
+        self.season = os.getenv("NBA_SEASON") or self.current_season()
+        self.parquet_columns = []
+        self.parquet_partitions = []
+        # "full" rewrites the raw snapshot; "incremental" uploads only changed players as deltas
+        self.ingest_mode = os.getenv("INGEST_MODE", "full").lower()
+        self.delta_prefix = "incremental/deltas"
+        self.compact_after_deltas = int(os.getenv("COMPACT_AFTER_DELTAS", 24))
         self.session = boto3.Session(aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'), aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'), region_name=os.getenv('AWS_REGION'))
         self.s3 = self.session.client("s3")
         self.glue = self.session.client("glue")
         self.athena = self.session.client("athena")
         self.iam = self.session.client("iam")
+        self.queries = AthenaQueryManager(
+            self.athena, self.athena_output_location,
+            cache_ttl=float(os.getenv("ATHENA_CACHE_TTL", 3600)), cache_path=os.getenv("ATHENA_CACHE_FILE"),
+        )
+        self.manifest = IngestManifest(
+            os.getenv("INGEST_MANIFEST", f"s3://{self.bucket_name}/manifests/nba_player_manifest.json"), self.s3
+        )
+
+    @staticmethod
+    def current_season():
+        """Return the season in progress, named by the year it ends in (as sportsdata.io does)."""
+        today = date.today()
+        return str(today.year + 1 if today.month >= 10 else today.year)
 
     def create_s3_bucket(self):
         """Create an S3 bucket for storing sports data."""
@@ -68,22 +105,141 @@ class DataLake:
         """Convert data to line-delimited JSON format."""
         print("Converting data to line-delimited JSON format...")
         return "\n".join([json.dumps(record) for record in data])
+    def iter_line_delimited_json(self, data):
+        """Yield each record of an iterable as an encoded JSON line."""
+        for record in data:
+            yield json.dumps(record).encode("utf-8") + b"\n"
     def upload_data_to_s3(self, data):
-        """Upload NBA data to the S3 bucket."""
+        """Stream NBA data to the S3 bucket as gzip-compressed line-delimited JSON.
+
+        data can be any iterable of records, including a generator; records
+        are encoded and compressed as they are consumed, so memory use is
+        bounded by the upload part size rather than the dataset size.
+        """
+        if self.output_format == "parquet":
+            return self.upload_parquet_to_s3(data)
         try:
-            line_delimited_data = self.convert_to_line_delimited_json(data)
-            # Define S3 object key
-            file_key = "raw-data/nba_player_data.json"
-            
-            # Upload JSON data to S3
-            self.s3.put_object(
+            self.write_records_to_s3(self.raw_data_key, data)
+        except Exception as e:
+            print(f"Error uploading data to S3: {e}")
+    def write_records_to_s3(self, file_key, records):
+        """Stream records to file_key as gzip-compressed line-delimited JSON. Raises on failure."""
+        with S3StreamWriter(self.s3, self.bucket_name, file_key, part_size=self.upload_part_size, max_workers=self.upload_workers) as writer:
+            writer.writelines(self.iter_line_delimited_json(records))
+        # Cached query results no longer reflect the data
+        self.queries.invalidate()
+        print(f"Uploaded data to S3: {file_key} ({writer.raw_bytes} bytes, {writer.compressed_bytes} compressed)")
+    def read_records_from_s3(self, file_key):
+        """Yield the records of a gzip-compressed line-delimited JSON object."""
+        body = self.s3.get_object(Bucket=self.bucket_name, Key=file_key)["Body"]
+        with gzip.GzipFile(fileobj=body) as lines:
+            for line in lines:
+                if line.strip():
+                    yield json.loads(line)
+    def ingest_incremental(self, data):
+        """Upload only players that are new, changed or removed since the last run.
+
+        The first run writes the full base snapshot. Later runs write a delta
+        file of changed records plus {"PlayerID": ..., "_deleted": true}
+        markers, and compact the deltas into the base once there are
+        compact_after_deltas of them.
+        """
+        try:
+            has_manifest = self.manifest.load()
+            changed, removed, hashes = self.manifest.diff(data)
+            if not has_manifest:
+                # With no manifest every record counts as changed
+                self.write_records_to_s3(self.raw_data_key, changed)
+                self.manifest.players = hashes
+                self.manifest.deltas = []
+                self.manifest.save()
+                print(f"No ingest manifest found; wrote base snapshot of {len(hashes)} players.")
+                return
+            if not changed and not removed:
+                print("No player changes since the last run; nothing uploaded.")
+                return
+
+            stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+            delta_key = f"{self.delta_prefix}/{stamp}.json.gz"
+            self.write_records_to_s3(delta_key, changed + [{"PlayerID": key, "_deleted": True} for key in removed])
+            self.manifest.players = hashes
+            self.manifest.deltas.append(delta_key)
+            self.manifest.save()
+            print(f"Uploaded delta with {len(changed)} changed and {len(removed)} removed players: {delta_key}")
+
+            if len(self.manifest.deltas) >= self.compact_after_deltas:
+                self.compact_deltas()
+        except Exception as e:
+            print(f"Error ingesting incremental data: {e}")
+    def compact_deltas(self):
+        """Merge all delta files into the base snapshot and delete them."""
+        if not self.manifest.load() or not self.manifest.deltas:
+            print("No deltas to compact.")
+            return
+        deltas = list(self.manifest.deltas)
+        players = {record_key(record): record for record in self.read_records_from_s3(self.raw_data_key)}
+        for delta_key in deltas:
+            for record in self.read_records_from_s3(delta_key):
+                if record.get("_deleted"):
+                    players.pop(record_key(record), None)
+                else:
+                    players[record_key(record)] = record
+        self.write_records_to_s3(self.raw_data_key, players.values())
+        # The new base is in place before the manifest forgets the deltas
+        self.manifest.deltas = []
+        self.manifest.save()
+        for start in range(0, len(deltas), 1000):
+            self.s3.delete_objects(
                 Bucket=self.bucket_name,
-                Key=file_key,
-                Body=line_delimited_data
+                Delete={"Objects": [{"Key": key} for key in deltas[start:start + 1000]], "Quiet": True},
+            )
+        print(f"Compacted {len(deltas)} deltas into {self.raw_data_key} ({len(players)} players).")
+    def upload_parquet_to_s3(self, data):
+        """Upload NBA data as compressed Parquet files partitioned by season and team."""
+        try:
+            table = parquet_writer.build_table(data, self.season)
+            self.parquet_columns = parquet_writer.data_columns(table)
+            self.parquet_partitions = parquet_writer.write_partitioned_parquet(
+                self.s3, self.bucket_name, self.parquet_prefix, table,
+                compression=self.parquet_compression, max_workers=self.upload_workers,
             )
-            print(f"Uploaded data to S3: {file_key}")
+            self.queries.invalidate()
+            print(f"Uploaded {table.num_rows} records as {len(self.parquet_partitions)} Parquet partitions to S3: {self.parquet_prefix}/")
         except Exception as e:
-            print(f"Error uploading data to S3: {e}")
+            print(f"Error uploading Parquet data to S3: {e}")
+    def parquet_table_ddl(self):
+        """Return the CREATE TABLE statement matching the uploaded Parquet files."""
+        columns = ",\n".join(f"    `{name}` {column_type}" for name, column_type in self.parquet_columns)
+        return (
+            f"CREATE EXTERNAL TABLE IF NOT EXISTS {self.parquet_table} (\n{columns}\n)\n"
+            f"PARTITIONED BY (season STRING, team STRING)\n"
+            f"STORED AS PARQUET\n"
+            f"LOCATION 's3://{self.bucket_name}/{self.parquet_prefix}/'\n"
+            f"TBLPROPERTIES ('parquet.compression'='{self.parquet_compression.upper()}')"
+        )
+    def partition_registration_queries(self, batch_size=100):
+        """Return ALTER TABLE statements registering the uploaded partitions."""
+        queries = []
+        for start in range(0, len(self.parquet_partitions), batch_size):
+            partitions = " ".join(
+                f"PARTITION (season='{sql_string(season)}', team='{sql_string(team)}') LOCATION 's3://{self.bucket_name}/{path}/'"
+                for season, team, path in self.parquet_partitions[start:start + batch_size]
+            )
+            queries.append(f"ALTER TABLE {self.parquet_table} ADD IF NOT EXISTS {partitions}")
+        return queries
+    def configure_parquet_table(self):
+        """Create the partitioned Parquet table in Athena and register the uploaded partitions."""
+        if not self.parquet_columns:
+            print("No Parquet data uploaded; skipping Parquet table setup.")
+            return
+        try:
+            self.queries.execute("CREATE DATABASE IF NOT EXISTS nba_analytics", database=self.glue_database_name)
+            self.queries.execute(self.parquet_table_ddl())
+            # Partition batches are independent of each other
+            self.queries.execute_many(self.partition_registration_queries())
+            print(f"Athena table '{self.parquet_table}' configured with {len(self.parquet_partitions)} partitions.")
+        except Exception as e:
+            print(f"Error configuring Parquet table: {e}")
     def create_glue_crawler(self):
         """Create a Glue crawler to catalog the NBA player data."""
         try:
@@ -288,20 +444,13 @@ class DataLake:
         try:
             # Create the database if it doesn't exist
             try:
-                self.athena.start_query_execution(
-                    QueryString="CREATE DATABASE IF NOT EXISTS nba_analytics",
-                    QueryExecutionContext={"Database": self.glue_database_name},
-                    ResultConfiguration={"OutputLocation": self.athena_output_location},
-                )
+                self.queries.execute("CREATE DATABASE IF NOT EXISTS nba_analytics", database=self.glue_database_name)
                 print("Athena output location configured successfully.")
             except Exception as e:
                 print(f"Error configuring Athena: {e}")
 
-            time.sleep(5)  # Wait for the query to complete
-
             # Create a table for player statistics
-            self.athena.start_query_execution(
-            QueryString=f"""
+            self.queries.execute(f"""
             CREATE EXTERNAL TABLE IF NOT EXISTS nba_analytics.player_stats (
                 player_id STRING,
                 first_name STRING,
@@ -314,11 +463,7 @@ class DataLake:
             )
             ROW FORMAT SERDE 'org.openx.data.jsonserde.JsonSerDe'
             LOCATION 's3://sports-data-lake/raw-data/player_statistics/'
-            """,
-            QueryExecutionContext={"Database": "nba_analytics"},
-            ResultConfiguration={"OutputLocation": self.athena_output_location},
-            )
-            time.sleep(5)  # Wait for the query to complete
+            """)
 
             # Create a table for team statistics
             # self.athena.start_query_execution(
@@ -340,8 +485,10 @@ class DataLake:
             print("Athena output location and tables configured successfully.")
         except Exception as e:
             print(f"Error configuring Athena: {e}")
+    def run_query(self, sql):
+        """Run an Athena query (or reuse a recent result) and yield its rows as dicts."""
+        return self.queries.query(sql)
 
-      
 
 def main():
     print("Setting up data lake for NBA sports analytics...")
@@ -351,7 +498,14 @@ def main():
     data_lake.create_glue_database()
     data = data_lake.fetch_nba_data()
     if data:
-        data_lake.upload_data_to_s3(data)
+        if data_lake.ingest_mode == "incremental":
+            data_lake.ingest_incremental(data)
+            if data_lake.output_format == "parquet":
+                data_lake.upload_parquet_to_s3(data)
+        else:
+            data_lake.upload_data_to_s3(data)
+        if data_lake.output_format == "parquet":
+            data_lake.configure_parquet_table()
     data_lake.create_glue_role()
     data_lake.create_glue_crawler()
     data_lake.run_glue_crawler()
@@ -361,4 +515,11 @@ def main():
     # print("Data lake setup completed successfully.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import sys
+    if sys.argv[1:] == ["compact"]:
+        DataLake().compact_deltas()
+    elif sys.argv[1:2] == ["query"] and len(sys.argv) == 3:
+        for row in DataLake().run_query(sys.argv[2]):
+            print(json.dumps(row))
+    else:
+        main()
\ No newline at end of file
@@ -0,0 +1,113 @@
+import io
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet output is optional
+    pa = None
+    pq = None
+
+PARTITION_COLUMNS = ("season", "team")
+COMPRESSIONS = ("snappy", "zstd")
+
+
+def require_pyarrow():
+    if pa is None:
+        raise RuntimeError("Parquet output requires pyarrow (pip install pyarrow)")
+
+
+def hive_type(arrow_type):
+    """Return the Athena/Hive column type for a pyarrow type."""
+    if pa.types.is_boolean(arrow_type):
+        return "BOOLEAN"
+    if pa.types.is_integer(arrow_type):
+        return "BIGINT"
+    if pa.types.is_floating(arrow_type):
+        return "DOUBLE"
+    if pa.types.is_timestamp(arrow_type):
+        return "TIMESTAMP"
+    if pa.types.is_date(arrow_type):
+        return "DATE"
+    if pa.types.is_list(arrow_type):
+        return f"ARRAY<{hive_type(arrow_type.value_type)}>"
+    if pa.types.is_struct(arrow_type):
+        fields = ",".join(f"{field.name}:{hive_type(field.type)}" for field in arrow_type)
+        return f"STRUCT<{fields}>"
+    return "STRING"
+
+
+def _normalize_type(arrow_type):
+    # Columns that are null everywhere have no type; store them as strings
+    if pa.types.is_null(arrow_type):
+        return pa.string()
+    if pa.types.is_integer(arrow_type):
+        return pa.int64()
+    if pa.types.is_list(arrow_type):
+        return pa.list_(_normalize_type(arrow_type.value_type))
+    if pa.types.is_struct(arrow_type):
+        return pa.struct([pa.field(field.name, _normalize_type(field.type)) for field in arrow_type])
+    return arrow_type
+
+
+def build_table(records, default_season):
+    """Build one Arrow table from all records, with lower-case column names
+    (Athena's convention) and season/team partition columns.
+
+    The schema is inferred once over the whole dataset, so every partition
+    file has the same column types.
+    """
+    require_pyarrow()
+    rows = []
+    for record in records:
+        row = {key.lower(): value for key, value in record.items()}
+        row["season"] = str(row.get("season") or default_season)
+        row["team"] = str(row.get("team") or "unknown")
+        rows.append(row)
+    # from_pylist would take the column names from the first row only
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    table = pa.Table.from_pydict({column: [row.get(column) for row in rows] for column in columns})
+    schema = pa.schema([pa.field(field.name, _normalize_type(field.type)) for field in table.schema])
+    return table.cast(schema)
+
+
+def data_columns(table):
+    """Return [(name, hive type)] for the non-partition columns of table."""
+    return [(field.name, hive_type(field.type)) for field in table.schema if field.name not in PARTITION_COLUMNS]
+
+
+def split_partitions(table):
+    """Return {(season, team): table without the partition columns}."""
+    indices = {}
+    for i, key in enumerate(zip(table.column("season").to_pylist(), table.column("team").to_pylist())):
+        indices.setdefault(key, []).append(i)
+    data = table.drop_columns(list(PARTITION_COLUMNS))
+    return {key: data.take(pa.array(rows)) for key, rows in indices.items()}
+
+
+def partition_path(prefix, season, team):
+    return f"{prefix}/season={quote(season, safe='')}/team={quote(team, safe='')}"
+
+
+def write_partitioned_parquet(s3, bucket_name, prefix, table, compression="snappy", max_workers=4):
+    """Write table to S3 as one Parquet file per season/team partition.
+
+    Each partition is written to <prefix>/season=<season>/team=<team>/part-00000.parquet,
+    replacing the previous file. Returns [(season, team, path)].
+    """
+    require_pyarrow()
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unsupported Parquet compression {compression!r}; expected one of {', '.join(COMPRESSIONS)}")
+    prefix = prefix.rstrip("/")
+
+    def upload(item):
+        (season, team), part = item
+        buffer = io.BytesIO()
+        pq.write_table(part, buffer, compression=compression)
+        path = partition_path(prefix, season, team)
+        s3.put_object(Bucket=bucket_name, Key=f"{path}/part-00000.parquet", Body=buffer.getvalue())
+        return season, team, path
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(upload, split_partitions(table).items()))
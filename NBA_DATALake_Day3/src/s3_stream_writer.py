@@ -0,0 +1,130 @@
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+# S3 rejects multipart parts smaller than 5 MiB (except the last one)
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+class S3StreamWriter:
+    """Gzip-compress a stream of bytes on the fly and upload it to S3 in parts.
+
+    Compressed output is cut into parts of part_size bytes that are uploaded
+    in parallel while later data is still being compressed. At most
+    max_workers parts are in flight, so peak memory is about
+    (max_workers + 1) * part_size whatever the size of the stream. A stream
+    that compresses to less than one part is sent with a single put_object.
+    """
+
+    def __init__(self, s3, bucket_name, key, part_size=8 * 1024 * 1024, max_workers=4, content_type="application/x-ndjson"):
+        self.s3 = s3
+        self.bucket_name = bucket_name
+        self.key = key
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.max_workers = max_workers
+        self.content_type = content_type
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+        # wbits=31 writes a gzip header and trailer
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        self._buffer = bytearray()
+        self._executor = None
+        self._upload_id = None
+        self._futures = []
+        self._parts = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+    def write(self, data):
+        """Compress data and upload any parts that are full."""
+        self.raw_bytes += len(data)
+        self._buffer += self._compressor.compress(data)
+        if len(self._buffer) >= self.part_size:
+            self._submit_part()
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def _start_upload(self):
+        upload = self.s3.create_multipart_upload(
+            Bucket=self.bucket_name,
+            Key=self.key,
+            ContentType=self.content_type,
+            ContentEncoding="gzip"
+        )
+        self._upload_id = upload["UploadId"]
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
+    def _upload_part(self, number, body):
+        part = self.s3.upload_part(
+            Bucket=self.bucket_name,
+            Key=self.key,
+            UploadId=self._upload_id,
+            PartNumber=number,
+            Body=body
+        )
+        return {"ETag": part["ETag"], "PartNumber": number}
+
+    def _submit_part(self):
+        if self._upload_id is None:
+            self._start_upload()
+        # Wait for the oldest part before buffering more, to bound memory
+        while len(self._futures) >= self.max_workers:
+            self._parts.append(self._futures.pop(0).result())
+        body = bytes(self._buffer)
+        self._buffer = bytearray()
+        self.compressed_bytes += len(body)
+        number = len(self._parts) + len(self._futures) + 1
+        self._futures.append(self._executor.submit(self._upload_part, number, body))
+
+    def close(self):
+        """Finish the gzip stream and complete the upload. Returns the object key."""
+        self._buffer += self._compressor.flush()
+        try:
+            if self._upload_id is None:
+                body = bytes(self._buffer)
+                self.compressed_bytes += len(body)
+                self.s3.put_object(
+                    Bucket=self.bucket_name,
+                    Key=self.key,
+                    Body=body,
+                    ContentType=self.content_type,
+                    ContentEncoding="gzip"
+                )
+                return self.key
+            self._submit_part()
+            self._parts.extend(future.result() for future in self._futures)
+            self._futures = []
+            self.s3.complete_multipart_upload(
+                Bucket=self.bucket_name,
+                Key=self.key,
+                UploadId=self._upload_id,
+                MultipartUpload={"Parts": sorted(self._parts, key=lambda part: part["PartNumber"])}
+            )
+            return self.key
+        except Exception:
+            self.abort()
+            raise
+        finally:
+            self._buffer = bytearray()
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+
+    def abort(self):
+        """Discard the upload and any parts already sent."""
+        if self._upload_id is None:
+            return
+        for future in self._futures:
+            future.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        self.s3.abort_multipart_upload(Bucket=self.bucket_name, Key=self.key, UploadId=self._upload_id)
+        self._upload_id = None
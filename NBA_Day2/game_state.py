@@ -0,0 +1,104 @@
+import os
+import json
+import hashlib
+import logging
+
+
+def snapshot_hash(game):
+    """
+    Hash of the parts of a game that are worth notifying about: status,
+    scores and quarter-by-quarter results.
+    """
+    snapshot = [
+        game.get('Status'),
+        game.get('HomeTeamScore'),
+        game.get('AwayTeamScore'),
+        [(q.get('Number'), q.get('AwayScore'), q.get('HomeScore')) for q in game.get('Quarters') or []],
+    ]
+    return hashlib.sha1(json.dumps(snapshot, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+
+def changed_games(games, previous):
+    """
+    Returns (changed, snapshots): the games whose hash differs from previous
+    ({GameID: hash}) and the hashes of every game in the slate.
+    """
+    snapshots = {}
+    changed = []
+    for game in games:
+        game_id = str(game['GameID'])
+        digest = snapshot_hash(game)
+        snapshots[game_id] = digest
+        if previous.get(game_id) != digest:
+            changed.append(game)
+    return changed, snapshots
+
+
+class FileStateStore:
+    """
+    Game snapshots kept in a JSON file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logging.error(f"Error loading game state from {self.path}: {e}")
+            return {}
+
+    def save(self, snapshots):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshots, f)
+        os.replace(tmp_path, self.path)
+
+
+class DbmStateStore:
+    """
+    Game snapshots kept in a dbm key-value file, one key per GameID.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        import dbm
+        try:
+            with dbm.open(self.path, 'r') as db:
+                return {key.decode('utf-8'): db[key].decode('utf-8') for key in db.keys()}
+        except dbm.error:
+            return {}
+
+    def save(self, snapshots):
+        import dbm
+        with dbm.open(self.path, 'c') as db:
+            for key in list(db.keys()):
+                if key.decode('utf-8') not in snapshots:
+                    del db[key]
+            for game_id, digest in snapshots.items():
+                db[game_id] = digest
+
+
+STATE_STORES = {
+    'file': FileStateStore,
+    'dbm': DbmStateStore,
+}
+
+
+def open_state_store(kind='file', path='/tmp/nba_game_state.json'):
+    """
+    Returns the state store named kind ('file' or 'dbm') at path.
+    """
+    try:
+        return STATE_STORES[kind](path)
+    except KeyError:
+        raise ValueError(f"Unknown game state store {kind!r}; expected one of {', '.join(STATE_STORES)}")
@@ -1,9 +1,14 @@
+import time
+_INIT_STARTED = time.perf_counter()
+
 import os
 import json
 import requests
-import boto3
+from requests.adapters import HTTPAdapter
 from datetime import datetime, timedelta, timezone
 import logging
+from game_state import changed_games, open_state_store
+from sns_publisher import SNSPublisher, chunk_messages
 # this two imports are required when running the code in aws lambda. Because I zipped the dependencies into a package folder and uploaded it to the lambda function.
 # import sys
 # sys.path.append('./package') 
@@ -11,55 +16,125 @@ import logging
 logging.basicConfig(
         level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
     )
+
+API_URL = "https://api.sportsdata.io/v3/nba/scores/json/GamesByDate/{date}"
+API_TIMEOUT = float(os.getenv("NBA_API_TIMEOUT", "10"))
+# Scores change during games, so warm containers only reuse results briefly
+GAMES_CACHE_TTL = float(os.getenv("GAMES_CACHE_TTL", "30"))
+SNS_PUBLISH_WORKERS = int(os.getenv("SNS_PUBLISH_WORKERS", "4"))
+SNS_PUBLISH_ATTEMPTS = int(os.getenv("SNS_PUBLISH_ATTEMPTS", "3"))
+# /tmp only survives while the container is warm; point this at an EFS mount to share it
+state_store = open_state_store(os.getenv("GAME_STATE_STORE", "file"), os.getenv("GAME_STATE_PATH", "/tmp/nba_game_state.json"))
+
+# Created once per container and reused by every warm invocation
+session = requests.Session()
+session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+_sns_client = None
+_games_cache = {}
+_cold_start = True
+
+
+def get_sns_client():
+    """
+    Returns the container's SNS client, importing boto3 and creating it on
+    first use so invocations that never publish don't pay for it.
+    """
+    global _sns_client
+    if _sns_client is None:
+        import boto3
+        from botocore.config import Config
+        _sns_client = boto3.client('sns', config=Config(
+            connect_timeout=5, read_timeout=10, tcp_keepalive=True, max_pool_connections=SNS_PUBLISH_WORKERS,
+        ))
+    return _sns_client
+
+
+def fetch_games(date, api_key):
+    """
+    Returns GamesByDate for date, reusing this container's result if it is
+    younger than GAMES_CACHE_TTL seconds.
+    """
+    cached = _games_cache.get(date)
+    if cached is not None and time.monotonic() - cached[0] < GAMES_CACHE_TTL:
+        logging.info(f"Using cached games for {date}")
+        return cached[1]
+    response = session.get(API_URL.format(date=date), params={"key": api_key}, timeout=API_TIMEOUT)
+    response.raise_for_status()
+    games = response.json()
+    # Only today's slate is ever requested, so one entry is enough
+    _games_cache.clear()
+    _games_cache[date] = (time.monotonic(), games)
+    return games
+
+
+# Message templates per game status, compiled once into bound format methods
+GAME_TEMPLATES = {
+    "Final": (
+        "Game Status: {Status}\n"
+        "{AwayTeam} vs {HomeTeam}\n"
+        "Final Score: {AwayTeamScore}-{HomeTeamScore}\n"
+        "Start Time: {DateTime}\n"
+        "Channel: {Channel}\n"
+        "Quarter Scores: {quarter_scores}\n"
+    ).format_map,
+    "InProgress": (
+        "Game Status: {Status}\n"
+        "{AwayTeam} vs {HomeTeam}\n"
+        "Current Score: {AwayTeamScore}-{HomeTeamScore}\n"
+        "Last Play: {LastPlay}\n"
+        "Channel: {Channel}\n"
+    ).format_map,
+    "Scheduled": (
+        "Game Status: {Status}\n"
+        "{AwayTeam} vs {HomeTeam}\n"
+        "Start Time: {DateTime}\n"
+        "Channel: {Channel}\n"
+    ).format_map,
+}
+UNAVAILABLE_TEMPLATE = (
+    "Game Status: {Status}\n"
+    "{AwayTeam} vs {HomeTeam}\n"
+    "Details are unavailable at the moment.\n"
+).format_map
+QUARTER_TEMPLATE = "Q{Number}: {AwayScore}-{HomeScore}".format_map
+
+
+class _QuarterScores(dict):
+    # Missing quarter scores render as N/A
+    def __missing__(self, key):
+        return 'N/A'
+
+
 def format_game_data(game):
-    game_id = game['GameID']
-    home_team = game['HomeTeam']
-    away_team = game['AwayTeam']
-    home_score = game['HomeTeamScore']
-    away_score = game['AwayTeamScore']
-    game_status = game['Status']
-    game_date = game['DateTime']
-    channel = game['Channel']
-    final_score = f"{away_score}-{home_score}"
-
-    quarters = game["Quarters"]
-    quarter_scores = ', '.join([f"Q{q['Number']}: {q.get('AwayScore', 'N/A')}-{q.get('HomeScore', 'N/A')}" for q in quarters])
-
-    if game_status == "Final":
-        return (
-            f"Game Status: {game_status}\n"
-            f"{away_team} vs {home_team}\n"
-            f"Final Score: {final_score}\n"
-            f"Start Time: {game_date}\n"
-            f"Channel: {channel}\n"
-            f"Quarter Scores: {quarter_scores}\n"
-        )
-    elif game_status == "InProgress":
-        last_play = game["LastPlay"]
-        return (
-            f"Game Status: {game_status}\n"
-            f"{away_team} vs {home_team}\n"
-            f"Current Score: {final_score}\n"
-            f"Last Play: {last_play}\n"
-            f"Channel: {channel}\n"
-        )
-    elif game_status == "Scheduled":
-        return (
-            f"Game Status: {game_status}\n"
-            f"{away_team} vs {home_team}\n"
-            f"Start Time: {game_date}\n"
-            f"Channel: {channel}\n"
-        )
-    else:
-        return (
-            f"Game Status: {game_status}\n"
-            f"{away_team} vs {home_team}\n"
-            f"Details are unavailable at the moment.\n"
-        )
+    template = GAME_TEMPLATES.get(game['Status'], UNAVAILABLE_TEMPLATE)
+    if game['Status'] == "Final":
+        quarter_scores = ', '.join([QUARTER_TEMPLATE(_QuarterScores(q)) for q in game["Quarters"]])
+        return template({**game, "quarter_scores": quarter_scores})
+    return template(game)
+
+
+def format_games(games):
+    """
+    Returns [(GameID, message)] for games in one pass over the templates.
+    """
+    return [(str(game['GameID']), format_game_data(game)) for game in games]
+
+
 def lambda_handler(event, context):
+    global _cold_start
+    handler_started = time.perf_counter()
+    cold_start, _cold_start = _cold_start, False
+    try:
+        return process(event)
+    finally:
+        handler_ms = (time.perf_counter() - handler_started) * 1000
+        init_ms = INIT_DURATION * 1000 if cold_start else 0.0
+        logging.info(f"cold_start={cold_start} init_ms={init_ms:.1f} handler_ms={handler_ms:.1f}")
+
+
+def process(event):
     api_key = os.environ['NBA_API_KEY']
     sns_topic = os.environ['SNS_TOPIC_ARN']
-    sns_client = boto3.client('sns')
 
     utc_now = datetime.now(timezone.utc)
     ps_time = utc_now - timedelta(hours=8)
@@ -67,12 +142,9 @@ def lambda_handler(event, context):
 
     logging.info(f"Fetching games for date: {today}")
 
-    api_url = f"https://api.sportsdata.io/v3/nba/scores/json/GamesByDate/{today}?key={api_key}"
     try:
-        response = requests.get(api_url)
-        response.raise_for_status()
-        games = response.json()
-        logging.info(f"Games fetched: {games}")
+        games = fetch_games(today, api_key)
+        logging.info(f"Games fetched: {len(games)}")
     except requests.exceptions.RequestException as e:
         logging.error(e)
         return {
@@ -80,17 +152,29 @@ def lambda_handler(event, context):
             'body': json.dumps(f'Internal Server Error: {e}')
         }
 
-    messages = [format_game_data(game) for game in games]
-    final_message = "\n---\n".join(messages) if messages else "No games available for today."
+    changed, snapshots = changed_games(games, state_store.load())
+    if not changed:
+        logging.info("No game changes since the last run; nothing to publish")
+        return {"statusCode": 200, "body": "No game changes"}
+    logging.info(f"Games changed: {len(changed)} of {len(games)}")
+
+    chunks = chunk_messages(format_games(changed))
+    publisher = SNSPublisher(
+        get_sns_client(), sns_topic, max_workers=SNS_PUBLISH_WORKERS, max_attempts=SNS_PUBLISH_ATTEMPTS,
+    )
+    published_ids, errors = publisher.publish(chunks)
+    print(f"Published {len(chunks) - len(errors)} of {len(chunks)} messages to SNS.")
+
+    # Only remember what was actually published, so failed games are retried next time
+    failed_ids = {str(game['GameID']) for game in changed} - set(published_ids)
     try:
-        sns_client.publish(
-            TopicArn=sns_topic,
-            Message=final_message,
-            Subject="NBA Game Updates"
-        )
-        print("Message published to SNS successfully.")
-    except Exception as e:
-        logging.error(f"Error publishing to SNS: {e}")
+        state_store.save({game_id: digest for game_id, digest in snapshots.items() if game_id not in failed_ids})
+    except OSError as e:
+        logging.error(f"Error saving game state: {e}")
+
+    if errors:
         return {"statusCode": 500, "body": "Error publishing to SNS"}
-    
     return {"statusCode": 200, "body": "Data processed and sent to SNS"}
+
+
+INIT_DURATION = time.perf_counter() - _INIT_STARTED
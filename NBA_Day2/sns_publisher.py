@@ -0,0 +1,83 @@
+import time
+import random
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+# SNS rejects messages over 256 KB; leave room for the part header
+MAX_MESSAGE_BYTES = 256 * 1024 - 1024
+SEPARATOR = "\n---\n"
+TRUNCATED = "\n[message truncated]\n"
+
+
+def chunk_messages(messages, max_bytes=MAX_MESSAGE_BYTES, separator=SEPARATOR):
+    """
+    Packs [(game_id, message)] into chunks no larger than max_bytes, splitting
+    only between games. Returns [(game_ids, text)].
+    """
+    separator_size = len(separator.encode('utf-8'))
+    chunks = []
+    ids, parts, size = [], [], 0
+    for game_id, message in messages:
+        encoded = message.encode('utf-8')
+        if len(encoded) > max_bytes:
+            # A single game can't be split further; cut it rather than fail the publish
+            limit = max_bytes - len(TRUNCATED.encode('utf-8'))
+            message = encoded[:limit].decode('utf-8', 'ignore') + TRUNCATED
+            encoded = message.encode('utf-8')
+        added = len(encoded) + (separator_size if parts else 0)
+        if parts and size + added > max_bytes:
+            chunks.append((ids, separator.join(parts)))
+            ids, parts, size = [], [], 0
+            added = len(encoded)
+        ids.append(game_id)
+        parts.append(message)
+        size += added
+    if parts:
+        chunks.append((ids, separator.join(parts)))
+    return chunks
+
+
+class SNSPublisher:
+    """
+    Publishes chunks to an SNS topic concurrently, retrying each failed
+    publish with exponential backoff and jitter.
+    """
+
+    def __init__(self, client, topic_arn, subject="NBA Game Updates", max_workers=4, max_attempts=3, backoff=0.5):
+        self.client = client
+        self.topic_arn = topic_arn
+        self.subject = subject
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+
+    def _publish(self, text, subject):
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                self.client.publish(TopicArn=self.topic_arn, Message=text, Subject=subject)
+                return
+            except Exception as e:
+                if attempt == self.max_attempts:
+                    raise
+                delay = self.backoff * 2 ** (attempt - 1) * (0.5 + random.random())
+                logging.warning(f"Publish of '{subject}' failed ({e}), retrying in {delay:.2f}s")
+                time.sleep(delay)
+
+    def publish(self, chunks):
+        """
+        Publishes [(game_ids, text)] and returns (published_ids, errors).
+        """
+        total = len(chunks)
+        subjects = [self.subject if total == 1 else f"{self.subject} ({i}/{total})" for i in range(1, total + 1)]
+        published_ids = []
+        errors = []
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, total))) as executor:
+            futures = [executor.submit(self._publish, text, subject) for (_, text), subject in zip(chunks, subjects)]
+            for (ids, _), subject, future in zip(chunks, subjects, futures):
+                try:
+                    future.result()
+                    published_ids.extend(ids)
+                except Exception as e:
+                    logging.error(f"Error publishing '{subject}' to SNS: {e}")
+                    errors.append(e)
+        return published_ids, errors
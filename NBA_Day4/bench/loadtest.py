@@ -0,0 +1,352 @@
+"""
+Load-test and startup benchmark for the schedule API.
+
+Boots the app (uvicorn, or a Docker image with --docker-image) against a
+local SerpAPI stub that returns sports_results.games payloads with
+configurable latency, measures cold start, then drives concurrent clients
+at an endpoint and reports RPS and p50/p95/p99 latency. Results are compared
+with bench/baseline.json.
+
+A Python client tops out well below what the app can serve, so the clients
+are spread over --client-processes processes, and the same load is also run
+against a canned-response server to record the client's own ceiling. A run
+whose RPS is close to that ceiling measured the load generator, not the app.
+
+    python bench/loadtest.py --concurrency 50 --duration 10 --client-processes 4
+    python bench/loadtest.py --save-baseline
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT, "bench", "baseline.json")
+
+# Metrics where a higher value is better; everything else is better lower
+HIGHER_IS_BETTER = {"rps", "ceiling_share"}
+# Runs reaching this fraction of the client ceiling are limited by the client
+CLIENT_BOUND_FRACTION = 0.8
+
+
+def make_games(count):
+    teams = ["Bills", "Jets", "Chiefs", "Broncos", "Eagles", "Giants", "Packers", "Bears", "49ers", "Rams"]
+    return [
+        {
+            "teams": [{"name": teams[i % len(teams)]}, {"name": teams[(i + 3) % len(teams)]}],
+            "venue": f"Stadium {i % 7}",
+            "date": f"Sun, Jan {i % 28 + 1}",
+            "time": "1:00 PM",
+        }
+        for i in range(count)
+    ]
+
+
+class SerpAPIStub(ThreadingHTTPServer):
+    """Returns a fixed sports_results.games payload after a configurable delay."""
+
+    daemon_threads = True
+
+    def __init__(self, latency, games):
+        super().__init__(("127.0.0.1", 0), SerpAPIStubHandler)
+        self.latency = latency
+        self.body = json.dumps({"sports_results": {"games": make_games(games)}}).encode("utf-8")
+        self.requests = 0
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/search.json"
+
+
+class SerpAPIStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    wbufsize = 64 * 1024
+
+    def do_GET(self):
+        self.server.requests += 1
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(self.server.body)))
+        self.end_headers()
+        self.wfile.write(self.server.body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class CannedResponseProtocol(asyncio.Protocol):
+    """Answers every request on the connection with the same response bytes."""
+
+    def __init__(self, response):
+        self.response = response
+        self.buffer = b""
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        # Load requests are bodiless GETs, so each header block is one request
+        self.buffer += data
+        count = self.buffer.count(b"\r\n\r\n")
+        if count:
+            self.buffer = self.buffer[self.buffer.rfind(b"\r\n\r\n") + 4:]
+            self.transport.write(self.response * count)
+
+
+def serve_canned(port, body, ready):
+    """Serves body on port until killed, with as little server work per request as possible."""
+    response = (
+        b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+        + f"Content-Length: {len(body)}\r\n\r\n".encode("ascii")
+        + body
+    )
+
+    async def serve():
+        loop = asyncio.get_running_loop()
+        server = await loop.create_server(lambda: CannedResponseProtocol(response), "127.0.0.1", port)
+        ready.set()
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_app(args, stub_url, port):
+    """Starts the service and returns the process handle."""
+    env = dict(os.environ)
+    env.update({
+        "SPORTS_API_KEY": env.get("SPORTS_API_KEY", "bench"),
+        "SERPAPI_BASE_URL": stub_url,
+        "WEB_CONCURRENCY": str(args.workers),
+        "SCHEDULE_CACHE_TTL": str(args.cache_ttl),
+    })
+    if args.docker_image:
+        # The container reaches the stub on the host network
+        command = [
+            "docker", "run", "--rm", "--network", "host",
+            "-e", f"SPORTS_API_KEY={env['SPORTS_API_KEY']}",
+            "-e", f"SERPAPI_BASE_URL={stub_url}",
+            "-e", f"WEB_CONCURRENCY={args.workers}",
+            "-e", f"SCHEDULE_CACHE_TTL={args.cache_ttl}",
+            "--entrypoint", "uvicorn", args.docker_image,
+            "main:app", "--host", "127.0.0.1", "--port", str(port),
+        ]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"]
+    return subprocess.Popen(command, cwd=ROOT, env=env)
+
+
+async def measure_cold_start(base_url, path, started_at, timeout=60):
+    """Returns seconds until the app accepts connections and until the first
+    successful response on path, and that response's body."""
+    ready = None
+    async with httpx.AsyncClient(timeout=5) as client:
+        while time.perf_counter() - started_at < timeout:
+            try:
+                response = await client.get(f"{base_url}/metrics")
+                if ready is None:
+                    ready = time.perf_counter() - started_at
+                if response.status_code == 200:
+                    response = await client.get(f"{base_url}{path}")
+                    if response.status_code == 200:
+                        return ready, time.perf_counter() - started_at, response.content
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.02)
+    raise TimeoutError(f"App did not serve {path} within {timeout}s")
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def run_clients(base_url, path, concurrency, duration):
+    """Runs concurrency closed-loop clients for duration seconds. Returns (latencies, errors, elapsed)."""
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    if response.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return latencies, errors, elapsed
+
+
+def run_client_process(base_url, path, concurrency, duration):
+    return asyncio.run(run_clients(base_url, path, concurrency, duration))
+
+
+def drive_load(base_url, path, concurrency, duration, processes=1):
+    """Spreads concurrency closed-loop clients over processes and combines their results."""
+    processes = max(1, min(processes, concurrency))
+    shares = [concurrency // processes + (i < concurrency % processes) for i in range(processes)]
+    if processes == 1:
+        runs = [run_client_process(base_url, path, concurrency, duration)]
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            runs = pool.starmap(run_client_process, [(base_url, path, share, duration) for share in shares])
+
+    latencies = sorted(latency for run_latencies, _, _ in runs for latency in run_latencies)
+    errors = sum(run_errors for _, run_errors, _ in runs)
+    elapsed = max(run_elapsed for _, _, run_elapsed in runs)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+def measure_client_ceiling(body, concurrency, duration, processes):
+    """Returns the RPS the load generator reaches against a server that does no work."""
+    port = free_port()
+    ready = multiprocessing.Event()
+    server = multiprocessing.Process(target=serve_canned, args=(port, body, ready), daemon=True)
+    server.start()
+    try:
+        if not ready.wait(10):
+            raise TimeoutError("Canned response server did not start")
+        return drive_load(f"http://127.0.0.1:{port}", "/", concurrency, duration, processes)["rps"]
+    finally:
+        server.terminate()
+        server.join()
+
+
+def compare(results, baseline, threshold):
+    """Prints the change against baseline and returns the names of regressed metrics."""
+    regressions = []
+    for label, run in (("Baseline", baseline), ("This run", results)):
+        if run.get("client_bound"):
+            print(f"Note: {label.lower()} reached {run['ceiling_share']:.0%} of the client ceiling; "
+                  f"its RPS reflects the load generator more than the app")
+    print(f"\n{'metric':<16} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name in ("rps", "ceiling_share", "p50_ms", "p95_ms", "p99_ms", "ready_s", "first_response_s"):
+        if name not in baseline or not baseline[name]:
+            continue
+        change = (results[name] - baseline[name]) / baseline[name]
+        worse = -change if name in HIGHER_IS_BETTER else change
+        flag = "  REGRESSION" if worse > threshold else ""
+        if flag:
+            regressions.append(name)
+        print(f"{name:<16} {baseline[name]:>10.2f} {results[name]:>10.2f} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the schedule API against a local SerpAPI stub")
+    parser.add_argument("--path", default="/sports", help="endpoint to load (e.g. /sports, /sports/all, /sports?team=Bills)")
+    parser.add_argument("--concurrency", type=int, default=50, help="concurrent clients")
+    parser.add_argument("--client-processes", type=int, default=min(4, os.cpu_count() or 1),
+                        help="processes the clients are spread over")
+    parser.add_argument("--duration", type=float, default=10, help="seconds of load")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--upstream-latency-ms", type=float, default=300, help="simulated SerpAPI latency")
+    parser.add_argument("--games", type=int, default=272, help="games in the stub payload")
+    parser.add_argument("--cache-ttl", type=float, default=300, help="SCHEDULE_CACHE_TTL for the app")
+    parser.add_argument("--docker-image", help="run this image instead of a local uvicorn process")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline results file")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative change counted as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit with status 1 on regression")
+    args = parser.parse_args()
+
+    stub = SerpAPIStub(args.upstream_latency_ms / 1000, args.games)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    started_at = time.perf_counter()
+    process = start_app(args, stub.url, port)
+    try:
+        ready, first_response, body = asyncio.run(measure_cold_start(base_url, args.path, started_at))
+        print(f"Cold start: accepting connections after {ready:.2f}s, first {args.path} response after {first_response:.2f}s")
+        results = drive_load(base_url, args.path, args.concurrency, args.duration, args.client_processes)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        stub.shutdown()
+    client_ceiling = measure_client_ceiling(body, args.concurrency, args.duration, args.client_processes)
+
+    results.update({
+        "path": args.path,
+        "concurrency": args.concurrency,
+        "client_processes": args.client_processes,
+        "client_ceiling_rps": client_ceiling,
+        # RPS relative to the client ceiling stays comparable across machines and client noise
+        "ceiling_share": results["rps"] / client_ceiling if client_ceiling else 0.0,
+        "client_bound": results["rps"] >= CLIENT_BOUND_FRACTION * client_ceiling,
+        "workers": args.workers,
+        "upstream_latency_ms": args.upstream_latency_ms,
+        "upstream_requests": stub.requests,
+        "ready_s": ready,
+        "first_response_s": first_response,
+    })
+    print(
+        f"{results['requests']} requests, {results['errors']} errors, {results['rps']:.0f} req/s, "
+        f"p50 {results['p50_ms']:.1f} ms, p95 {results['p95_ms']:.1f} ms, p99 {results['p99_ms']:.1f} ms, "
+        f"{results['upstream_requests']} upstream calls"
+    )
+    print(f"Client ceiling against a canned {len(body)}-byte response: {client_ceiling:.0f} req/s")
+    if results["client_bound"]:
+        print("Warning: the load generator is the bottleneck; add --client-processes or run the clients on another host")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if any(baseline.get(key) != results[key] for key in ("path", "concurrency", "client_processes", "workers", "upstream_latency_ms")):
+        print("Note: baseline was recorded with different settings; comparison is indicative only")
+    regressions = compare(results, baseline, args.threshold)
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
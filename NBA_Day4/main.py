@@ -1,7 +1,120 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
-import requests
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import Response
+import asyncio
+import bisect
+import hashlib
+import httpx
+import json
 import os
+import time
+from collections import defaultdict
+from metrics import Registry, RequestMetricsMiddleware
+from schedule_cache import ScheduleCache
+from shared_cache import SharedScheduleStore, default_cache_path
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# "orjson" (default when installed) or "json"
+JSON_ENCODER = os.getenv("JSON_ENCODER", "orjson" if orjson else "json")
+
+def encode_json(content) -> bytes:
+    """
+    Encodes content as compact UTF-8 JSON, using orjson when selected.
+    """
+    if JSON_ENCODER == "orjson" and orjson is not None:
+        return orjson.dumps(content)
+    # Same settings as Starlette's JSONResponse
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+def make_etag(body:bytes) -> str:
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+def etag_matches(if_none_match:str, etag:str) -> bool:
+    """
+    Returns True if an If-None-Match header value matches etag.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in tags)
+
+class EncodedSchedule:
+    """
+    Formatted games together with their encoded response body, ETag and
+    lookup indexes. Built once per refresh and shared by every request.
+    """
+
+    # Encoded filtered pages kept per schedule before the page cache is reset
+    MAX_CACHED_PAGES = 512
+
+    def __init__(self, games:list, league:str="nfl", fetched_at:float=None):
+        self.games = games
+        self.league = league
+        # Wall-clock time the games were fetched upstream; ScheduleCache ages the entry from it
+        self.fetched_at = time.time() if fetched_at is None else fetched_at
+        if games:
+            content = {"message": f"{league.upper()} schedule fetched successfully.", "games": games}
+        else:
+            content = {"message": f"No {league.upper()} schedule available.", "games": []}
+        self.body = encode_json(content)
+        self.etag = make_etag(self.body)
+
+        # Case-insensitive value -> ascending game positions
+        self.by_team = defaultdict(list)
+        self.by_date = defaultdict(list)
+        self.by_venue = defaultdict(list)
+        for position, game in enumerate(games):
+            self.by_team[game["away_team"].lower()].append(position)
+            if game["home_team"].lower() != game["away_team"].lower():
+                self.by_team[game["home_team"].lower()].append(position)
+            self.by_date[game["date"].lower()].append(position)
+            self.by_venue[game["venue"].lower()].append(position)
+        self._pages = {}
+
+    def select(self, team:str=None, date:str=None, venue:str=None) -> list:
+        """
+        Returns the ascending positions of games matching every given filter.
+        """
+        candidates = []
+        for index, value in ((self.by_team, team), (self.by_date, date), (self.by_venue, venue)):
+            if value is not None:
+                candidates.append(index.get(value.lower(), []))
+        if not candidates:
+            return list(range(len(self.games)))
+        candidates.sort(key=len)
+        others = [set(positions) for positions in candidates[1:]]
+        return [position for position in candidates[0] if all(position in other for other in others)]
+
+    def page(self, team:str=None, date:str=None, venue:str=None, cursor:int=0, limit:int=50):
+        """
+        Returns (body, etag) for one page of matching games starting at
+        position cursor. The body includes next_cursor, or null on the last page.
+        """
+        key = (team and team.lower(), date and date.lower(), venue and venue.lower(), cursor, limit)
+        cached = self._pages.get(key)
+        if cached is not None:
+            return cached
+
+        positions = self.select(team, date, venue)
+        start = bisect.bisect_left(positions, cursor)
+        selected = positions[start:start + limit]
+        next_cursor = str(selected[-1] + 1) if start + limit < len(positions) else None
+        body = encode_json({
+            "message": f"{self.league.upper()} schedule fetched successfully." if selected else f"No matching {self.league.upper()} games.",
+            "games": [self.games[position] for position in selected],
+            "next_cursor": next_cursor,
+        })
+
+        if len(self._pages) >= self.MAX_CACHED_PAGES:
+            self._pages.clear()
+        self._pages[key] = (body, make_etag(body))
+        return self._pages[key]
 
 class SerpAPIClient:
 
@@ -9,25 +122,63 @@ class SerpAPIClient:
     Client class to interact with the SerpAPI.
     """
 
-    BASE_URL = "https://serpapi.com/search.json"
+    # Overridable so benchmarks can point the service at a local stub
+    BASE_URL = os.getenv("SERPAPI_BASE_URL", "https://serpapi.com/search.json")
 
-    def __init__(self, api_key:str):
+    def __init__(self, api_key:str, timeout:float=10.0, max_concurrency:int=10):
         if not api_key:
             raise ValueError("API Key is required")
         self.api_key = api_key
-    
-    def fetch_nfl_schedule(self):
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self._client = None
+        self._semaphore = None
+
+    def _get_client(self) -> httpx.AsyncClient:
         """
-        Fetches the NFL schedule from SerpAPI.
+        Returns the shared keep-alive client, creating it on first use so it
+        binds to the running event loop.
+        """
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    async def close(self):
+        """
+        Closes the pooled HTTP client.
+        """
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def fetch_schedule(self, query:str):
+        """
+        Fetches the Google sports results for query (e.g. "nba schedule") from SerpAPI,
+        bounded by the client's timeout.
         """
         params = {
             "engine": "google",
-            "q": "nfl schedule",
+            "q": query,
             "api_key": self.api_key
         }
-        response = requests.get(self.BASE_URL, params=params)
+        client = self._get_client()
+        async with self._semaphore:
+            response = await client.get(self.BASE_URL, params=params)
         response.raise_for_status()
         return response.json()
+
+    async def fetch_nfl_schedule(self):
+        """
+        Fetches the NFL schedule from SerpAPI.
+        """
+        return await self.fetch_schedule("nfl schedule")
 class NFLScheduleService:
     """
     Service class to process NFL schedule data.
@@ -59,30 +210,224 @@ class NFLScheduleService:
 
         return formatted_games
 
-app = FastAPI()
-
 # Load API key from environment variables
 SERP_API_KEY = os.getenv("SPORTS_API_KEY")
 # Instantiate SerpAPIClient
-serp_api_client = SerpAPIClient(api_key=SERP_API_KEY)
+serp_api_client = SerpAPIClient(
+    api_key=SERP_API_KEY,
+    timeout=float(os.getenv("SERPAPI_TIMEOUT", "10")),
+    max_concurrency=int(os.getenv("SERPAPI_MAX_CONCURRENCY", "10")),
+)
 
-@app.get("/sports")
-async def get_nfl_schedule():
+metrics_registry = Registry()
+STAGE_LATENCY = metrics_registry.histogram(
+    "schedule_stage_duration_seconds", "Time spent in each stage of building a schedule response.", ("league", "stage")
+)
+UPSTREAM_CALLS = metrics_registry.counter(
+    "serpapi_requests_total", "SerpAPI requests by league and outcome.", ("league", "outcome")
+)
+
+# League -> SerpAPI search query. Each league has its own cache.
+LEAGUES = {
+    league.strip().lower(): f"{league.strip().lower()} schedule"
+    for league in os.getenv("SPORTS_LEAGUES", "nfl,nba,nhl").split(",")
+    if league.strip()
+}
+LEAGUE_TIMEOUT = float(os.getenv("LEAGUE_TIMEOUT", "5"))
+
+def league_timeout(league:str) -> float:
     """
-    Endpoint to fetch and return the NFL schedule.
+    Returns how long /sports/all waits for a league: LEAGUE_TIMEOUT_<LEAGUE> if set, else LEAGUE_TIMEOUT.
     """
-    try:
-        data = serp_api_client.fetch_nfl_schedule()
-        formatted_games = NFLScheduleService.format_games(data)
+    return float(os.getenv(f"LEAGUE_TIMEOUT_{league.upper()}", LEAGUE_TIMEOUT))
+
+SCHEDULE_CACHE_TTL = float(os.getenv("SCHEDULE_CACHE_TTL", "300"))
+
+# With several uvicorn workers (WEB_CONCURRENCY), share each schedule between them
+# so only one worker at a time calls SerpAPI per league
+SHARED_CACHE_DIR = os.getenv("SCHEDULE_SHARED_CACHE_DIR")
+USE_SHARED_CACHE = bool(SHARED_CACHE_DIR) or int(os.getenv("WEB_CONCURRENCY", "1")) > 1
+
+async def fetch_formatted_games(league:str):
+    """
+    Fetches and formats a league's schedule from SerpAPI.
+    """
+    with STAGE_LATENCY.time(league, "upstream"):
+        try:
+            data = await serp_api_client.fetch_schedule(LEAGUES[league])
+        except Exception:
+            UPSTREAM_CALLS.inc(league, "error")
+            raise
+    UPSTREAM_CALLS.inc(league, "success")
+    with STAGE_LATENCY.time(league, "format"):
+        return NFLScheduleService.format_games(data)
+
+def make_schedule_loader(league:str, shared_store:SharedScheduleStore=None):
+    """
+    Returns the ScheduleCache loader for a league, going through the shared store when enabled.
+    """
+    async def fetch():
+        return await fetch_formatted_games(league)
+
+    async def load():
+        if shared_store is not None:
+            games, fetched_at = await shared_store.load(fetch, max_age=SCHEDULE_CACHE_TTL)
+        else:
+            games, fetched_at = await fetch(), time.time()
+        # Encode once per refresh; every request until the next one reuses the bytes
+        with STAGE_LATENCY.time(league, "encode"):
+            return EncodedSchedule(games, league, fetched_at)
+    return load
 
-        if not formatted_games:
-            return JSONResponse(content={"message": "No NFL schedule available.", "games": []}, status_code=200)
+def build_schedule_caches() -> dict:
+    """
+    Creates one ScheduleCache per league.
+    """
+    caches = {}
+    for league in LEAGUES:
+        shared_store = None
+        if USE_SHARED_CACHE:
+            shared_store = SharedScheduleStore(
+                path=default_cache_path(league, SHARED_CACHE_DIR),
+                wait_timeout=serp_api_client.timeout + 5,
+            )
+        caches[league] = ScheduleCache(
+            loader=make_schedule_loader(league, shared_store),
+            ttl=SCHEDULE_CACHE_TTL,
+            stale_ttl=float(os.getenv("SCHEDULE_STALE_TTL", "3600")),
+        )
+    return caches
+
+# Schedules change rarely, so serve them from memory and refresh in the background
+schedule_caches = build_schedule_caches()
+
+def cache_stat(name:str):
+    return lambda: {(league,): cache.stats()[name] for league, cache in schedule_caches.items()}
+
+metrics_registry.counter("schedule_cache_hits_total", "Requests served from a fresh cached schedule.", ("league",), callback=cache_stat("hits"))
+metrics_registry.counter("schedule_cache_stale_hits_total", "Requests served from a stale cached schedule while it refreshed.", ("league",), callback=cache_stat("stale_hits"))
+metrics_registry.counter("schedule_cache_misses_total", "Requests that waited for a schedule load.", ("league",), callback=cache_stat("misses"))
+metrics_registry.counter("schedule_cache_refresh_errors_total", "Schedule loads that failed.", ("league",), callback=cache_stat("errors"))
+metrics_registry.gauge("schedule_cache_hit_ratio", "Fraction of requests served from the cache.", ("league",), callback=cache_stat("hit_ratio"))
+IN_FLIGHT = metrics_registry.gauge("http_requests_in_flight", "Requests currently being served.")
+REQUEST_LATENCY = metrics_registry.histogram("http_request_duration_seconds", "Request latency by route.", ("route",))
+RESPONSES = metrics_registry.counter("http_responses_total", "Responses by route and status code.", ("route", "status"))
 
-        return JSONResponse(content={"message": "NFL schedule fetched successfully.", "games": formatted_games}, status_code=200)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await serp_api_client.close()
 
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(RequestMetricsMiddleware, in_flight=IN_FLIGHT, latency=REQUEST_LATENCY, responses=RESPONSES)
+
+async def schedule_response(request:Request, league:str, team:str, date:str, venue:str, limit:int, cursor:str) -> Response:
+    """
+    Builds the (optionally filtered and paged) schedule response for a league.
+    """
+    if league not in schedule_caches:
+        raise HTTPException(status_code=404, detail={"message": f"Unknown league '{league}'.", "leagues": list(LEAGUES)})
+    try:
+        schedule = await schedule_caches[league].get()
     except Exception as e:
         raise HTTPException(status_code=500, detail={"message": "An error occurred.", "error": str(e)})
 
+    if team is None and date is None and venue is None and limit is None and cursor is None:
+        body, etag = schedule.body, schedule.etag
+    else:
+        if cursor is not None and not cursor.isdigit():
+            raise HTTPException(status_code=400, detail={"message": "Invalid cursor."})
+        with STAGE_LATENCY.time(league, "page"):
+            body, etag = schedule.page(team, date, venue, int(cursor or 0), limit or 50)
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/sports")
+async def get_nfl_schedule(
+    request: Request,
+    team: str = Query(None, description="Only games where this team plays home or away"),
+    date: str = Query(None, description="Only games on this date, as shown in the schedule (e.g. 'Sun, Jan 5')"),
+    venue: str = Query(None, description="Only games at this venue"),
+    limit: int = Query(None, ge=1, le=100, description="Games per page (default 50 when paging)"),
+    cursor: str = Query(None, description="next_cursor from the previous page"),
+):
+    """
+    Endpoint to fetch and return the NFL schedule.
+
+    Without query parameters the full schedule is returned. With any filter,
+    limit or cursor the response is one page of matching games plus a
+    next_cursor for the following page.
+    """
+    return await schedule_response(request, "nfl", team, date, venue, limit, cursor)
+
+@app.get("/sports/all")
+async def get_all_schedules(request: Request):
+    """
+    Endpoint to fetch every league's schedule concurrently.
+
+    Each league is bounded by its league_timeout(); leagues that fail or time
+    out are reported with an error and the rest are still returned. If every
+    league fails the response is a 503.
+    """
+    async def get_league(league):
+        # The cache shields its load, so a timed-out league keeps loading for later requests
+        return await asyncio.wait_for(schedule_caches[league].get(), timeout=league_timeout(league))
+
+    leagues = list(schedule_caches)
+    results = await asyncio.gather(*(get_league(league) for league in leagues), return_exceptions=True)
+
+    # Splice the pre-encoded per-league bodies instead of re-encoding every game
+    parts = []
+    etags = []
+    partial = False
+    failed = 0
+    for league, result in zip(leagues, results):
+        if isinstance(result, EncodedSchedule):
+            parts.append(encode_json(league) + b":" + result.body)
+            etags.append(result.etag)
+        else:
+            partial = True
+            failed += 1
+            error = "timeout" if isinstance(result, asyncio.TimeoutError) else str(result)
+            parts.append(encode_json(league) + b":" + encode_json({"message": f"{league.upper()} schedule unavailable.", "error": error, "games": []}))
+    body = b'{"partial":' + (b"true" if partial else b"false") + b',"leagues":{' + b",".join(parts) + b"}}"
+
+    if partial:
+        # Never let clients cache an incomplete answer
+        status_code = 503 if failed == len(leagues) else 200
+        return Response(content=body, status_code=status_code, media_type="application/json", headers={"Cache-Control": "no-store"})
+    etag = make_etag("".join(etags).encode("utf-8"))
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/sports/{league}")
+async def get_league_schedule(
+    request: Request,
+    league: str,
+    team: str = Query(None, description="Only games where this team plays home or away"),
+    date: str = Query(None, description="Only games on this date, as shown in the schedule"),
+    venue: str = Query(None, description="Only games at this venue"),
+    limit: int = Query(None, ge=1, le=100, description="Games per page (default 50 when paging)"),
+    cursor: str = Query(None, description="next_cursor from the previous page"),
+):
+    """
+    Endpoint to fetch and return one league's schedule (e.g. /sports/nba).
+    Supports the same filters and paging as /sports.
+    """
+    return await schedule_response(request, league.lower(), team, date, venue, limit, cursor)
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Prometheus metrics for this worker process.
+    """
+    return Response(content=metrics_registry.render(), media_type=Registry.CONTENT_TYPE)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8080)
\ No newline at end of file
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ScheduleCache:
+    """
+    In-memory cache with stale-while-revalidate and request coalescing.
+
+    Fresh values (younger than ttl) are served directly. Stale values (up to
+    stale_ttl past ttl) are served immediately while a single background
+    refresh runs. On a miss, concurrent callers share one in-flight load.
+
+    If the loaded value has a fetched_at attribute (wall-clock seconds), it
+    is aged from that time rather than from the load, so an already-stale
+    copy (e.g. handed out by another worker mid-refresh) is retried after
+    retry_interval instead of being served as fresh for a full ttl.
+    """
+
+    def __init__(self, loader, ttl:float=300, stale_ttl:float=3600, retry_interval:float=1.0):
+        self.loader = loader
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.retry_interval = retry_interval
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.errors = 0
+        self._value = None
+        self._fetched_at = 0.0
+        self._inflight = None
+
+    async def get(self):
+        """
+        Returns the cached value, loading or refreshing it as needed.
+        """
+        if self._value is not None:
+            age = time.monotonic() - self._fetched_at
+            if age < self.ttl:
+                self.hits += 1
+                return self._value
+            if age < self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                self._start_refresh()
+                return self._value
+        self.misses += 1
+        # Shield so one cancelled caller does not cancel the load for everyone
+        return await asyncio.shield(self._start_refresh())
+
+    def invalidate(self):
+        """
+        Drops the cached value so the next call loads a fresh one.
+        """
+        self._value = None
+
+    def _start_refresh(self) -> asyncio.Future:
+        if self._inflight is None:
+            self._inflight = asyncio.ensure_future(self._load())
+            self._inflight.add_done_callback(self._log_failure)
+        return self._inflight
+
+    async def _load(self):
+        try:
+            self.refreshes += 1
+            value = await self.loader()
+            self._value = value
+            self._fetched_at = time.monotonic()
+            fetched_at = getattr(value, "fetched_at", None)
+            if fetched_at is not None:
+                # Keep at least retry_interval before the next refresh attempt
+                age = min(max(0.0, time.time() - fetched_at), max(0.0, self.ttl - self.retry_interval))
+                self._fetched_at -= age
+            return value
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self._inflight = None
+
+    @staticmethod
+    def _log_failure(future:asyncio.Future):
+        # Background refreshes have no awaiting caller; surface their errors here
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning("Schedule refresh failed: %s", future.exception())
+
+    def stats(self):
+        """
+        Returns hit/miss counters for the cache.
+        """
+        total = self.hits + self.stale_hits + self.misses
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "errors": self.errors,
+            "hit_ratio": (self.hits + self.stale_hits) / total if total else 0.0,
+        }
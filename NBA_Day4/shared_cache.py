@@ -0,0 +1,107 @@
+import asyncio
+import fcntl
+import json
+import os
+import tempfile
+import time
+
+
+def default_cache_path(league:str="nfl", directory:str=None) -> str:
+    """
+    Returns the cache file path for a league, by default on shared memory
+    (/dev/shm) when available, else in the temp dir.
+    """
+    if directory is None:
+        directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(directory, f"{league}_schedule_cache.json")
+
+
+class SharedScheduleStore:
+    """
+    File-backed schedule store shared by all uvicorn workers on one host.
+
+    Workers read the latest schedule from the file. When it is older than
+    max_age, the worker that wins a non-blocking flock on a sidecar lock file
+    refreshes it from upstream; the others keep serving the previous copy
+    (or wait for the first one if there is none yet).
+    """
+
+    def __init__(self, path:str=None, poll_interval:float=0.05, wait_timeout:float=15.0):
+        self.path = path or default_cache_path()
+        self.lock_path = f"{self.path}.lock"
+        self.poll_interval = poll_interval
+        self.wait_timeout = wait_timeout
+        self.upstream_refreshes = 0
+        self._mtime = None
+        self._entry = None
+
+    def read(self):
+        """
+        Returns {"fetched_at", "games"} from the file, or None if it does not exist.
+        The file is only parsed again when its mtime changes.
+        """
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        if mtime != self._mtime:
+            try:
+                with open(self.path, "rb") as f:
+                    self._entry = json.loads(f.read())
+                self._mtime = mtime
+            except (OSError, ValueError):
+                return self._entry
+        return self._entry
+
+    def _write(self, games:list):
+        entry = {"fetched_at": time.time(), "games": games}
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entry, f)
+        # Atomic, so readers never see a partially written file
+        os.replace(tmp_path, self.path)
+        return entry
+
+    def _try_lock(self):
+        lock_file = open(self.lock_path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return lock_file
+        except BlockingIOError:
+            lock_file.close()
+            return None
+
+    async def load(self, fetch, max_age:float) -> tuple:
+        """
+        Returns (games, fetched_at) from the shared store, calling the async
+        fetch() to refresh it only if it is older than max_age and no other
+        worker is refreshing. fetched_at is the wall-clock time of the fetch,
+        so callers can tell when they were handed a stale copy.
+        """
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            entry = self.read()
+            if entry is not None and time.time() - entry["fetched_at"] < max_age:
+                return entry["games"], entry["fetched_at"]
+
+            lock_file = self._try_lock()
+            if lock_file is not None:
+                try:
+                    # Another worker may have finished a refresh while we took the lock
+                    entry = self.read()
+                    if entry is not None and time.time() - entry["fetched_at"] < max_age:
+                        return entry["games"], entry["fetched_at"]
+                    games = await fetch()
+                    self.upstream_refreshes += 1
+                    entry = self._write(games)
+                    return entry["games"], entry["fetched_at"]
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                    lock_file.close()
+
+            # Someone else is refreshing: serve what we have, or wait for their result
+            if entry is not None:
+                return entry["games"], entry["fetched_at"]
+            if time.monotonic() > deadline:
+                raise TimeoutError("Timed out waiting for another worker to load the schedule")
+            await asyncio.sleep(self.poll_interval)
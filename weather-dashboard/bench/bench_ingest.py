@@ -0,0 +1,278 @@
+"""
+Benchmark for the fetch -> encode -> sink ingest path.
+
+Runs weatherDashboard against a local HTTP stub that serves OpenWeather-shaped
+payloads (built from the samples in data/) and an in-process S3 stand-in, and
+sweeps city counts and concurrency levels.
+
+    python bench/bench_ingest.py --cities 50,200 --concurrency 1,8,32 --latency-ms 20
+"""
+import os
+import sys
+import json
+import glob
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+
+def load_samples():
+    samples = []
+    for path in sorted(glob.glob(os.path.join(ROOT, "data", "*.json"))):
+        try:
+            with open(path) as f:
+                sample = json.load(f)
+        except ValueError:
+            continue
+        if "main" in sample:
+            sample.pop("timestamp", None)
+            samples.append(sample)
+    return samples
+
+
+class StubOpenWeather(ThreadingHTTPServer):
+    """Serves /weather?q=<city> and /group?id=<ids> with sample payloads after a fixed delay."""
+
+    daemon_threads = True
+
+    def __init__(self, samples, latency):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.samples = samples
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def payload(self, city_id, name):
+        sample = dict(self.samples[city_id % len(self.samples)])
+        sample["id"] = city_id
+        sample["name"] = name
+        sample["dt"] = int(time.time())
+        return sample
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Buffer headers and body into one write so keep-alive clients do not stall on delayed ACKs
+    wbufsize = 64 * 1024
+
+    def do_GET(self):
+        server = self.server
+        with server._lock:
+            server.requests += 1
+        if server.latency:
+            time.sleep(server.latency)
+
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        if url.path.endswith("/weather") and "q" in params:
+            name = params["q"][0]
+            body = server.payload(int(name.rsplit("-", 1)[-1]), name)
+        elif url.path.endswith("/group") and "id" in params:
+            ids = [int(city_id) for city_id in params["id"][0].split(",")]
+            items = [server.payload(city_id, f"city-{city_id}") for city_id in ids]
+            body = {"cnt": len(items), "list": items}
+        else:
+            self.send_error(404)
+            return
+
+        encoded = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalS3:
+    """In-process stand-in for the boto3 S3 calls used by the sinks."""
+
+    def __init__(self):
+        self.objects = {}
+        self._uploads = {}
+        self._lock = threading.Lock()
+
+    def head_bucket(self, Bucket):
+        return {}
+
+    def create_bucket(self, Bucket, **kwargs):
+        return {}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        with self._lock:
+            self.objects[Key] = Body
+        return {}
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        with self._lock:
+            upload_id = str(len(self._uploads) + 1)
+            self._uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        with self._lock:
+            self._uploads[UploadId][PartNumber] = Body
+        return {"ETag": f"{UploadId}-{PartNumber}"}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        with self._lock:
+            parts = self._uploads.pop(UploadId)
+            self.objects[Key] = b"".join(parts[part["PartNumber"]] for part in MultipartUpload["Parts"])
+        return {}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        with self._lock:
+            self._uploads.pop(UploadId, None)
+        return {}
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run_case(stub, city_count, concurrency, group_size, workdir, trace_memory=False):
+    """
+    Ingest city_count cities once and return the measurements.
+
+    tracemalloc slows allocation-heavy code several times over, so peak
+    memory is only measured when trace_memory is set and timings from such
+    a run should not be reported.
+    """
+    # Local sinks write relative to the working directory
+    os.chdir(workdir)
+    os.environ.update({
+        "WEATHER_API_URL": stub.url,
+        "WEATHER_APIKEY": "bench",
+        "WEATHER_BUCKET_NAME": "bench",
+        "WEATHER_MAX_WORKERS": str(concurrency),
+        "WEATHER_GROUP_SIZE": str(group_size),
+        "WEATHER_CACHE_TTL": "0",
+        "WEATHER_SKIP_UNCHANGED": "false",
+        "WEATHER_CITY_REGISTRY": os.path.join(workdir, "cities.json"),
+    })
+    from weather_dashboard import weatherDashboard
+
+    dashboard = weatherDashboard()
+    s3 = LocalS3()
+    dashboard.s3 = s3
+    if hasattr(dashboard.s3_sink, "s3"):
+        dashboard.s3_sink.s3 = s3
+    if dashboard.s3_writer:
+        dashboard.s3_writer.s3 = s3
+
+    cities = [f"city-{i}" for i in range(city_count)]
+    if group_size > 1:
+        # Group requests need resolved ids; warm the registry like a previous run would
+        for city in cities:
+            dashboard.cities.register(city, {"id": int(city.rsplit("-", 1)[-1]), "name": city})
+
+    requests_before = stub.requests
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    latencies = []
+    failures = 0
+    for city, weather_data, latency in dashboard.fetch_all(cities):
+        latencies.append(latency)
+        if weather_data:
+            dashboard.pipeline.publish(weather_data, city)
+        else:
+            failures += 1
+    dashboard.flush()
+    elapsed = time.perf_counter() - start
+    peak = 0
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    dashboard.pipeline.close()
+
+    stored = city_count - failures
+    return {
+        "cities": city_count,
+        "concurrency": concurrency,
+        "group_size": group_size,
+        "http_requests": stub.requests - requests_before,
+        "failures": failures,
+        "seconds": elapsed,
+        "obs_per_sec": stored / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "peak_mem_mb": peak / (1024 * 1024),
+        "sink_errors": sum(stats["errors"] for stats in dashboard.pipeline.stats().values()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the weather ingest path against local stand-ins")
+    parser.add_argument("--cities", default="10,100", help="comma-separated city counts")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated worker counts")
+    parser.add_argument("--group-size", type=int, default=1, help="cities per group request (1 fetches by name)")
+    parser.add_argument("--latency-ms", type=float, default=20, help="simulated upstream latency")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per case; the fastest is reported")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+
+    samples = load_samples()
+    if not samples:
+        print(f"No sample payloads found in {os.path.join(ROOT, 'data')}")
+        sys.exit(1)
+
+    stub = StubOpenWeather(samples, args.latency_ms / 1000)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+
+    cwd = os.getcwd()
+    results = []
+    print(f"{'cities':>7} {'workers':>7} {'requests':>8} {'obs/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'peak MB':>8} {'errors':>6}")
+    try:
+        for city_count in [int(value) for value in args.cities.split(",")]:
+            for concurrency in [int(value) for value in args.concurrency.split(",")]:
+                best = None
+                # The extra last run only measures memory
+                for attempt in range(args.repeat + 1):
+                    trace_memory = attempt == args.repeat
+                    workdir = tempfile.mkdtemp(prefix="weather-bench-")
+                    try:
+                        result = run_case(stub, city_count, concurrency, args.group_size, workdir, trace_memory)
+                    finally:
+                        os.chdir(cwd)
+                        shutil.rmtree(workdir, ignore_errors=True)
+                    if trace_memory:
+                        best["peak_mem_mb"] = result["peak_mem_mb"]
+                    elif best is None or result["obs_per_sec"] > best["obs_per_sec"]:
+                        best = result
+                results.append(best)
+                print(
+                    f"{best['cities']:>7} {best['concurrency']:>7} {best['http_requests']:>8} {best['obs_per_sec']:>9.1f} "
+                    f"{best['p50_ms']:>8.1f} {best['p99_ms']:>8.1f} {best['peak_mem_mb']:>8.2f} "
+                    f"{best['failures'] + best['sink_errors']:>6}"
+                )
+    finally:
+        stub.shutdown()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import os
+import json
+import threading
+
+
+class CityRegistry:
+    """
+    Persistent mapping of city names to OpenWeather city ids and coordinates.
+
+    Ids come from the `id` and `coord` fields of earlier responses, so a city
+    is geocoded by name only once and later fetched by id.
+    """
+
+    def __init__(self, path="data/cities.json"):
+        self.path = path
+        self._cities = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self._cities = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Error loading city registry from {path}: {e}")
+
+    def get(self, city):
+        """Return {'id', 'name', 'coord'} for city, or None if it has not been resolved yet."""
+        return self._cities.get(city.lower())
+
+    def register(self, city, weather_data):
+        """Remember the id and coordinates of city from an OpenWeather response."""
+        if not weather_data or 'id' not in weather_data:
+            return
+        entry = {
+            "id": weather_data['id'],
+            "name": weather_data.get('name', city),
+            "coord": weather_data.get('coord'),
+        }
+        with self._lock:
+            if self._cities.get(city.lower()) != entry:
+                self._cities[city.lower()] = entry
+                self._dirty = True
+
+    def save(self):
+        """Write the registry to disk if anything changed."""
+        with self._lock:
+            if not self._dirty:
+                return
+            cities = dict(self._cities)
+            self._dirty = False
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(cities, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Error saving city registry to {self.path}: {e}")
@@ -0,0 +1,190 @@
+import os
+import re
+import sys
+import json
+import mmap
+import threading
+from array import array
+from datetime import datetime
+
+# Column name -> (array typecode, path into the OpenWeather payload)
+COLUMNS = {
+    "city": ("I", None),
+    "dt": ("q", ("dt",)),
+    "temp": ("f", ("main", "temp")),
+    "feels_like": ("f", ("main", "feels_like")),
+    "humidity": ("f", ("main", "humidity")),
+    "pressure": ("f", ("main", "pressure")),
+    "wind_speed": ("f", ("wind", "speed")),
+    "wind_deg": ("f", ("wind", "deg")),
+}
+
+FILE_NAME_PATTERN = re.compile(r"^(?P<city>.+)-(?P<timestamp>\d{8}-\d{6})\.json$")
+
+
+class HistoryStore:
+    """
+    Append-only local history of observations stored as one binary file per column.
+
+    Each column is a flat array of fixed-size values, so appending a row is a
+    handful of small writes and reads memory-map the files instead of parsing
+    JSON. City names are interned into cities.json and stored as integer ids.
+    """
+
+    def __init__(self, directory="data/history"):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._files = {}
+        self._maps = []
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self._cities_path = os.path.join(directory, "cities.json")
+        self._cities = []
+        if os.path.exists(self._cities_path):
+            with open(self._cities_path) as f:
+                self._cities = json.load(f)
+        self._city_ids = {name: i for i, name in enumerate(self._cities)}
+
+    def _column_path(self, name):
+        return os.path.join(self.directory, f"{name}.bin")
+
+    def _city_id(self, city):
+        city_id = self._city_ids.get(city)
+        if city_id is None:
+            city_id = len(self._cities)
+            self._cities.append(city)
+            self._city_ids[city] = city_id
+            with open(self._cities_path, 'w') as f:
+                json.dump(self._cities, f)
+        return city_id
+
+    def append(self, weather_data, city):
+        """Append one observation as a new row in every column."""
+        self.append_many([(weather_data, city)])
+
+    def append_many(self, observations):
+        """Append (weather_data, city) pairs, writing each column once."""
+        with self._lock:
+            values = {name: array(typecode) for name, (typecode, _) in COLUMNS.items()}
+            for weather_data, city in observations:
+                values["city"].append(self._city_id(city))
+                for name, (_, path) in COLUMNS.items():
+                    if path:
+                        values[name].append(extract_field(weather_data, path, name))
+            if not self._files:
+                self._truncate_partial_rows()
+            for name, column in values.items():
+                f = self._files.get(name)
+                if f is None:
+                    f = self._files[name] = open(self._column_path(name), 'ab')
+                column.tofile(f)
+                f.flush()
+
+    def _truncate_partial_rows(self):
+        # Cut every column back to the last complete row before appending, or
+        # rows written after a crash would be misaligned across columns. Done
+        # when append handles are opened rather than in __init__, so read-only
+        # users (e.g. queries) never truncate files a running writer is extending.
+        rows = len(self)
+        for name, (typecode, _) in COLUMNS.items():
+            path = self._column_path(name)
+            size = rows * array(typecode).itemsize
+            if os.path.exists(path) and os.path.getsize(path) != size:
+                os.truncate(path, size)
+
+    def __len__(self):
+        # A crash between column writes can leave columns uneven; ignore partial rows
+        return min(
+            os.path.getsize(self._column_path(name)) // array(typecode).itemsize if os.path.exists(self._column_path(name)) else 0
+            for name, (typecode, _) in COLUMNS.items()
+        )
+
+    def cities(self):
+        """Return city names indexed by the ids stored in the city column."""
+        return list(self._cities)
+
+    def columns(self):
+        """Return a dict of read-only memoryviews, one per column, all the same length."""
+        rows = len(self)
+        views = {}
+        for name, (typecode, _) in COLUMNS.items():
+            if rows == 0:
+                views[name] = memoryview(array(typecode))
+                continue
+            with open(self._column_path(name), 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps.append(mapped)
+            views[name] = memoryview(mapped).cast(typecode)[:rows]
+        return views
+
+    def rows(self, city=None):
+        """Yield observations as dicts, optionally for a single city."""
+        views = self.columns()
+        city_id = self._city_ids.get(city) if city else None
+        if city and city_id is None:
+            return
+        for i in range(len(views["city"])):
+            if city_id is not None and views["city"][i] != city_id:
+                continue
+            row = {name: views[name][i] for name in COLUMNS}
+            row["city"] = self._cities[row["city"]]
+            yield row
+
+    def close(self):
+        """Close append handles and release memory maps."""
+        with self._lock:
+            for f in self._files.values():
+                f.close()
+            self._files = {}
+        # Maps with live memoryviews cannot be closed yet; they are freed with the views
+        for mapped in self._maps:
+            try:
+                mapped.close()
+            except BufferError:
+                pass
+        self._maps = []
+
+    def import_json_dir(self, directory="data"):
+        """Import {city}-{YYYYmmdd-HHMMSS}.json files, oldest first. Returns the row count."""
+        entries = []
+        for file_name in os.listdir(directory):
+            match = FILE_NAME_PATTERN.match(file_name)
+            if not match:
+                continue
+            timestamp = datetime.strptime(match.group("timestamp"), '%Y%m%d-%H%M%S')
+            entries.append((timestamp, match.group("city"), os.path.join(directory, file_name)))
+
+        observations = []
+        for _, city, path in sorted(entries):
+            try:
+                with open(path) as f:
+                    observations.append((json.load(f), city))
+            except (OSError, ValueError) as e:
+                print(f"Skipping {path}: {e}")
+        self.append_many(observations)
+        print(f"Imported {len(observations)} observations from {directory} into {self.directory}")
+        return len(observations)
+
+
+def extract_field(weather_data, path, name):
+    """Return the value at path in an OpenWeather payload, or a missing-value marker."""
+    value = weather_data
+    for key in path:
+        if not isinstance(value, dict) or key not in value:
+            return 0 if name == "dt" else float('nan')
+        value = value[key]
+    return value
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] != "import":
+        print("Usage: python src/history_store.py import [json_dir] [history_dir]")
+        sys.exit(1)
+    json_dir = sys.argv[2] if len(sys.argv) > 2 else "data"
+    history_dir = sys.argv[3] if len(sys.argv) > 3 else "data/history"
+    store = HistoryStore(history_dir)
+    store.import_json_dir(json_dir)
+    store.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+import os
+import json
+import hashlib
+import threading
+
+
+class IngestState:
+    """
+    Persisted per-city record of the last stored observation.
+
+    Keeps the upstream `dt` and a content hash for each city so repeated
+    fetches of an unchanged observation can be skipped instead of written.
+    """
+
+    def __init__(self, path="data/ingest_state.json"):
+        self.path = path
+        self.written = 0
+        self.skipped = 0
+        self._cities = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self._cities = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Error loading ingest state from {path}: {e}")
+
+    @staticmethod
+    def content_hash(weather_data):
+        # Our own timestamp changes on every write, so leave it out of the hash
+        content = {key: value for key, value in weather_data.items() if key != 'timestamp'}
+        return hashlib.sha256(json.dumps(content, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def check(self, city, weather_data):
+        """
+        Return the state entry to commit once weather_data is stored, or None
+        if it matches the last observation stored for city.
+        """
+        entry = {"dt": weather_data.get('dt'), "hash": self.content_hash(weather_data)}
+        with self._lock:
+            if self._cities.get(city) == entry:
+                self.skipped += 1
+                return None
+        return entry
+
+    def commit(self, city, entry):
+        """Record entry (from check()) as the last observation stored for city."""
+        with self._lock:
+            self._cities[city] = entry
+            self._dirty = True
+            self.written += 1
+
+    def commit_if_stored(self, city, entry, futures):
+        """
+        Wait for the sink writes of one observation and commit entry only if
+        every write succeeded, so a failed write is retried on the next run.
+        """
+        if all(future.result() for future in futures):
+            self.commit(city, entry)
+            return True
+        return False
+
+    def last_dt(self, city):
+        """Return the upstream dt of the last stored observation for city, or None."""
+        entry = self._cities.get(city)
+        return entry["dt"] if entry else None
+
+    def save(self):
+        """Write the state file if anything changed."""
+        with self._lock:
+            if not self._dirty:
+                return
+            cities = dict(self._cities)
+            self._dirty = False
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(cities, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Error saving ingest state to {self.path}: {e}")
@@ -0,0 +1,129 @@
+import io
+import gzip
+import json
+import time
+import uuid
+import threading
+from datetime import datetime
+
+# S3 rejects multipart parts smaller than 5 MiB (except the last one)
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+class S3BatchWriter:
+    """
+    Buffers records into one gzip-compressed NDJSON object per time window.
+
+    The buffer is flushed when it holds max_bytes of uncompressed data or
+    when its oldest record is max_age seconds old. Compressed batches larger
+    than part_size are sent with a multipart upload. A batch whose upload
+    fails is kept and retried on the next flush.
+    """
+
+    def __init__(self, s3, bucket_name, prefix="weather-data/batches", max_bytes=16 * 1024 * 1024, max_age=300, part_size=8 * 1024 * 1024):
+        self.s3 = s3
+        self.bucket_name = bucket_name
+        self.prefix = prefix.rstrip('/')
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self._lock = threading.Lock()
+        # Closed batches waiting to be uploaded: (file_key, body, count)
+        self._pending = []
+        self._reset()
+
+    def _reset(self):
+        self._buffer = io.BytesIO()
+        self._gzip = gzip.GzipFile(fileobj=self._buffer, mode='wb')
+        self._raw_bytes = 0
+        self._count = 0
+        self._opened_at = None
+
+    def add(self, record):
+        """Append one record to the current batch, flushing if the batch is full or old."""
+        return self.add_line(json.dumps(record).encode('utf-8') + b"\n")
+
+    def add_line(self, line):
+        """Append an already encoded NDJSON line (ending in a newline) to the current batch."""
+        with self._lock:
+            if self._opened_at is None:
+                self._opened_at = time.time()
+            self._gzip.write(line)
+            self._raw_bytes += len(line)
+            self._count += 1
+            if self._raw_bytes >= self.max_bytes or time.time() - self._opened_at >= self.max_age:
+                return self._flush_locked()
+        return None
+
+    def flush_if_expired(self):
+        """Upload the current batch only if its oldest record is max_age seconds old."""
+        with self._lock:
+            expired = self._opened_at is not None and time.time() - self._opened_at >= self.max_age
+            if expired or self._pending:
+                return self._flush_locked()
+        return None
+
+    def flush(self):
+        """Upload the current batch, if any. Returns the object key or None."""
+        with self._lock:
+            return self._flush_locked()
+
+    def _flush_locked(self):
+        if self._count:
+            self._gzip.close()
+            window = datetime.fromtimestamp(self._opened_at).strftime('%Y%m%d-%H%M%S')
+            file_key = f"{self.prefix}/{window}-{uuid.uuid4().hex[:8]}.ndjson.gz"
+            self._pending.append((file_key, self._buffer.getvalue(), self._count))
+            self._reset()
+
+        uploaded = None
+        while self._pending:
+            file_key, body, count = self._pending[0]
+            # Raises with the batch still queued, so the next flush retries it
+            self._upload(file_key, body)
+            self._pending.pop(0)
+            print(f"Uploaded batch of {count} records ({len(body)} bytes) to S3: {file_key}")
+            uploaded = file_key
+        return uploaded
+
+    def _upload(self, file_key, body):
+        if len(body) > self.part_size:
+            self._multipart_upload(file_key, body)
+        else:
+            self.s3.put_object(
+                Bucket=self.bucket_name,
+                Key=file_key,
+                Body=body,
+                ContentType='application/x-ndjson',
+                ContentEncoding='gzip'
+            )
+
+    def _multipart_upload(self, file_key, body):
+        upload = self.s3.create_multipart_upload(
+            Bucket=self.bucket_name,
+            Key=file_key,
+            ContentType='application/x-ndjson',
+            ContentEncoding='gzip'
+        )
+        upload_id = upload['UploadId']
+        try:
+            parts = []
+            view = memoryview(body)
+            for number, offset in enumerate(range(0, len(body), self.part_size), start=1):
+                part = self.s3.upload_part(
+                    Bucket=self.bucket_name,
+                    Key=file_key,
+                    UploadId=upload_id,
+                    PartNumber=number,
+                    Body=bytes(view[offset:offset + self.part_size])
+                )
+                parts.append({"ETag": part['ETag'], "PartNumber": number})
+            self.s3.complete_multipart_upload(
+                Bucket=self.bucket_name,
+                Key=file_key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": parts}
+            )
+        except Exception:
+            self.s3.abort_multipart_upload(Bucket=self.bucket_name, Key=file_key, UploadId=upload_id)
+            raise
@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+
+
+def encode_observation(weather_data):
+    """Stamp weather_data with the current time and encode it once as JSON bytes."""
+    timestamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    weather_data['timestamp'] = timestamp
+    return timestamp, json.dumps(weather_data).encode('utf-8')
+
+
+class Sink:
+    """
+    Destination for encoded observations.
+
+    write() receives the shared JSON body plus the decoded dict for sinks
+    that store fields rather than bytes. It should raise on failure.
+    """
+
+    name = "sink"
+
+    def write(self, city, timestamp, body, weather_data):
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+
+class S3ObjectSink(Sink):
+    """Writes one JSON object per observation under weather-data/."""
+
+    name = "s3"
+
+    def __init__(self, s3, bucket_name):
+        self.s3 = s3
+        self.bucket_name = bucket_name
+
+    def write(self, city, timestamp, body, weather_data):
+        self.s3.put_object(
+            Bucket=self.bucket_name,
+            Key=f"weather-data/{city}-{timestamp}.json",
+            Body=body,
+            ContentType='application/json'
+        )
+
+
+class S3BatchSink(Sink):
+    """Appends observations to an S3BatchWriter as NDJSON lines."""
+
+    name = "s3-batch"
+
+    def __init__(self, writer):
+        self.writer = writer
+
+    def write(self, city, timestamp, body, weather_data):
+        self.writer.add_line(body + b"\n")
+
+    def flush(self):
+        self.writer.flush()
+
+
+class LocalJsonSink(Sink):
+    """Writes one JSON file per observation into a local directory."""
+
+    name = "local"
+
+    def __init__(self, directory="data"):
+        self.directory = directory
+
+    def write(self, city, timestamp, body, weather_data):
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory, exist_ok=True)
+        with open(f"{self.directory}/{city}-{timestamp}.json", 'wb') as f:
+            f.write(body)
+
+
+class HistorySink(Sink):
+    """Appends observations to the columnar HistoryStore."""
+
+    name = "history"
+
+    def __init__(self, store):
+        self.store = store
+
+    def write(self, city, timestamp, body, weather_data):
+        self.store.append(weather_data, city)
+
+    def flush(self):
+        self.store.close()
+
+
+class SinkStats:
+    def __init__(self):
+        self.writes = 0
+        self.errors = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def record(self, latency, ok):
+        self.writes += 1
+        if not ok:
+            self.errors += 1
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+
+    def as_dict(self):
+        return {
+            "writes": self.writes,
+            "errors": self.errors,
+            "mean_latency": self.total_latency / self.writes if self.writes else 0.0,
+            "max_latency": self.max_latency,
+        }
+
+
+class SinkPipeline:
+    """
+    Encodes each observation once and writes it to every registered sink concurrently.
+
+    publish() returns immediately; flush() waits for pending writes and then
+    flushes every sink. Per-sink write counts, errors and latency are kept
+    in stats().
+    """
+
+    def __init__(self, max_workers=4):
+        self.sinks = []
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def register(self, sink):
+        self.sinks.append(sink)
+        self._stats[sink.name] = SinkStats()
+        return sink
+
+    def publish(self, weather_data, city):
+        """Encode weather_data once and queue a write to every sink."""
+        timestamp, body = encode_observation(weather_data)
+        futures = [
+            self._executor.submit(self._write, sink, city, timestamp, body, weather_data)
+            for sink in self.sinks
+        ]
+        with self._lock:
+            self._pending.update(futures)
+        for future in futures:
+            future.add_done_callback(self._done)
+        return futures
+
+    def _done(self, future):
+        with self._lock:
+            self._pending.discard(future)
+
+    def _write(self, sink, city, timestamp, body, weather_data):
+        start = time.perf_counter()
+        try:
+            sink.write(city, timestamp, body, weather_data)
+            ok = True
+        except Exception as e:
+            print(f"Error saving {city} to {sink.name}: {e}")
+            ok = False
+        latency = time.perf_counter() - start
+        with self._lock:
+            self._stats[sink.name].record(latency, ok)
+        return ok
+
+    def flush(self):
+        """Wait for queued writes, then flush every sink. Returns the names of sinks that failed to flush."""
+        with self._lock:
+            pending = list(self._pending)
+        wait(pending)
+        failed = []
+        for sink in self.sinks:
+            try:
+                sink.flush()
+            except Exception as e:
+                print(f"Error flushing {sink.name}: {e}")
+                failed.append(sink.name)
+                with self._lock:
+                    self._stats[sink.name].errors += 1
+        return failed
+
+    def stats(self):
+        """Return per-sink write counts, error counts and latency in seconds."""
+        with self._lock:
+            return {name: stats.as_dict() for name, stats in self._stats.items()}
+
+    def close(self):
+        self.flush()
+        self._executor.shutdown()
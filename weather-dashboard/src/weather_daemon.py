@@ -0,0 +1,140 @@
+import time
+import heapq
+import signal
+import threading
+
+
+class CitySchedule:
+    """Polling state for one city."""
+
+    def __init__(self, city, interval):
+        self.city = city
+        self.interval = interval
+        self.last_dt = None
+        # Estimated seconds between upstream observations for this city
+        self.period = None
+        self.polls = 0
+        self.unchanged = 0
+
+
+class WeatherDaemon:
+    """
+    Long-running poller that keeps one weatherDashboard (and its clients) warm.
+
+    Each city has its own next-poll time. When a city's `dt` changes, the
+    daemon learns how often that city updates and schedules the next poll
+    just after the expected next observation; when it has not changed yet,
+    the interval backs off. Intervals stay between min_interval and
+    max_interval seconds.
+    """
+
+    def __init__(self, dashboard, cities, min_interval=60, max_interval=1800, initial_interval=600, slack=30):
+        self.dashboard = dashboard
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.slack = slack
+        self.schedules = {city: CitySchedule(city, initial_interval) for city in cities}
+        self.stop_event = threading.Event()
+        # Cached responses would hide dt changes from the scheduler
+        self.dashboard.cache.ttl = min(self.dashboard.cache.ttl, min_interval)
+
+    def _clamp(self, interval):
+        return max(self.min_interval, min(self.max_interval, interval))
+
+    def _reschedule(self, schedule, weather_data, now):
+        schedule.polls += 1
+        if not weather_data:
+            schedule.interval = self._clamp(schedule.interval * 2)
+            return now + schedule.interval
+
+        dt = weather_data.get('dt')
+        if dt is None or dt == schedule.last_dt:
+            schedule.unchanged += 1
+            schedule.interval = self._clamp(schedule.interval * 1.5)
+            return now + schedule.interval
+
+        if schedule.last_dt is not None:
+            delta = dt - schedule.last_dt
+            schedule.period = delta if schedule.period is None else 0.7 * schedule.period + 0.3 * delta
+        schedule.last_dt = dt
+        if schedule.period is None:
+            return now + schedule.interval
+
+        # Poll shortly after the next observation is expected to be published
+        schedule.interval = self._clamp(dt + schedule.period + self.slack - time.time())
+        return now + schedule.interval
+
+    def stop(self, *args):
+        self.stop_event.set()
+
+    def poll(self, cities):
+        """Fetch cities once, store changed observations and return {city: next poll time}."""
+        dashboard = self.dashboard
+        next_runs = {}
+        published = []
+        for city, weather_data, latency in dashboard.fetch_all(cities):
+            now = time.monotonic()
+            schedule = self.schedules[city]
+            next_runs[city] = self._reschedule(schedule, weather_data, now)
+            if not weather_data:
+                print(f"Failed to fetch weather data for {city}, retrying in {schedule.interval:.0f}s")
+                continue
+            entry = dashboard.state.check(city, weather_data) if dashboard.state else None
+            if dashboard.state and entry is None:
+                continue
+            futures = dashboard.pipeline.publish(weather_data, city)
+            if entry is not None:
+                published.append((city, entry, futures))
+            print(f"Stored {city} (dt={weather_data.get('dt')}, {latency * 1000:.0f} ms), next poll in {schedule.interval:.0f}s")
+        # Only remember observations every sink stored, so failed writes are retried
+        for city, entry, futures in published:
+            if not dashboard.state.commit_if_stored(city, entry, futures):
+                print(f"Saving {city} failed; it will be stored again on the next poll")
+        for city in cities:
+            if city not in next_runs:
+                next_runs[city] = time.monotonic() + self.schedules[city].interval
+        return next_runs
+
+    def save(self):
+        dashboard = self.dashboard
+        if dashboard.s3_writer:
+            try:
+                dashboard.s3_writer.flush_if_expired()
+            except Exception as e:
+                print(f"Error flushing S3 batch: {e}")
+        if dashboard.state:
+            dashboard.state.save()
+        dashboard.cache.save()
+        dashboard.cities.save()
+
+    def run(self):
+        """Poll until stopped by SIGINT/SIGTERM or stop()."""
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        self.dashboard.create_bucket_if_not_exists()
+        now = time.monotonic()
+        queue = [(now, city) for city in self.schedules]
+        heapq.heapify(queue)
+        print(f"Polling {len(self.schedules)} cities every {self.min_interval}-{self.max_interval}s")
+
+        while queue and not self.stop_event.is_set():
+            next_run, _ = queue[0]
+            delay = next_run - time.monotonic()
+            if delay > 0:
+                self.stop_event.wait(delay)
+                continue
+
+            now = time.monotonic()
+            due = []
+            while queue and queue[0][0] <= now:
+                due.append(heapq.heappop(queue)[1])
+            for city, next_time in self.poll(due).items():
+                heapq.heappush(queue, (next_time, city))
+            self.save()
+
+        self.dashboard.flush()
+        self.save()
+        polls = sum(schedule.polls for schedule in self.schedules.values())
+        unchanged = sum(schedule.unchanged for schedule in self.schedules.values())
+        print(f"Stopped after {polls} polls ({unchanged} returned an unchanged observation)")
@@ -1,10 +1,19 @@
 import os
+import argparse
 import dotenv
 import boto3
 import logging
 import requests
-import json
-from datetime import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+from requests.adapters import HTTPAdapter
+from weather_cache import TTLCache
+from s3_batch_writer import S3BatchWriter
+from history_store import HistoryStore
+from city_registry import CityRegistry
+from ingest_state import IngestState
+from sink_pipeline import SinkPipeline, S3ObjectSink, S3BatchSink, LocalJsonSink, HistorySink, encode_observation
 
 class weatherDashboard:
     def __init__(self):
@@ -13,6 +22,53 @@ class weatherDashboard:
         self.api_key = os.getenv('WEATHER_APIKEY')
         self.bucket_name = os.getenv('WEATHER_BUCKET_NAME')
         self.s3 = boto3.client('s3', aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'), aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'))
+        self.api_url = os.getenv('WEATHER_API_URL', 'http://api.openweathermap.org/data/2.5').rstrip('/')
+        self.max_workers = int(os.getenv('WEATHER_MAX_WORKERS', '8'))
+        self.timeout = float(os.getenv('WEATHER_TIMEOUT', '10'))
+
+        # One keep-alive session shared by every worker thread
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        # 'object' writes one JSON object per city, 'batch' buffers gzip NDJSON batches
+        self.s3_writer = None
+        if os.getenv('WEATHER_S3_MODE', 'object') == 'batch':
+            self.s3_writer = S3BatchWriter(
+                self.s3,
+                self.bucket_name,
+                max_bytes=int(os.getenv('WEATHER_BATCH_MAX_BYTES', str(16 * 1024 * 1024))),
+                max_age=float(os.getenv('WEATHER_BATCH_MAX_AGE', '300')),
+            )
+
+        # 'json' writes one file per observation, 'columnar' appends to the history store
+        self.history = None
+        if os.getenv('WEATHER_LOCAL_MODE', 'json') == 'columnar':
+            self.history = HistoryStore(os.getenv('WEATHER_HISTORY_DIR', 'data/history'))
+
+        # OpenWeather only refreshes observations about every 10 minutes
+        self.cache = TTLCache(
+            ttl=float(os.getenv('WEATHER_CACHE_TTL', '600')),
+            max_size=int(os.getenv('WEATHER_CACHE_SIZE', '1024')),
+            path=os.getenv('WEATHER_CACHE_FILE'),
+        )
+
+        # Resolved city ids let us use the multi-city group endpoint (max 20 ids per call)
+        self.cities = CityRegistry(os.getenv('WEATHER_CITY_REGISTRY', 'data/cities.json'))
+        self.group_size = min(int(os.getenv('WEATHER_GROUP_SIZE', '20')), 20)
+
+        # Observations with the same dt and content as the last stored one are skipped
+        self.state = None
+        if os.getenv('WEATHER_SKIP_UNCHANGED', 'true').lower() == 'true':
+            self.state = IngestState(os.getenv('WEATHER_STATE_FILE', 'data/ingest_state.json'))
+
+        # Every observation is encoded once and written to all sinks concurrently
+        self.s3_sink = S3BatchSink(self.s3_writer) if self.s3_writer else S3ObjectSink(self.s3, self.bucket_name)
+        self.local_sink = HistorySink(self.history) if self.history is not None else LocalJsonSink("data")
+        self.pipeline = SinkPipeline(max_workers=self.max_workers)
+        self.pipeline.register(self.s3_sink)
+        self.pipeline.register(self.local_sink)
         print(f'API Key: {self.api_key}')
      
     def create_bucket_if_not_exists(self):
@@ -28,7 +84,13 @@ class weatherDashboard:
             print(f"Error creating bucket {self.bucket_name}")
             print(e)
     def fetch_weather_data(self, city):
-        base_url = 'http://api.openweathermap.org/data/2.5/weather'
+        cached = self.cache.get(city.lower())
+        if cached is not None:
+            # Sinks add a timestamp to the dict, so never hand out the cached one
+            return dict(cached)
+        return self._fetch_by_name(city)
+    def _fetch_by_name(self, city):
+        base_url = f'{self.api_url}/weather'
         params = {
             'q': city,
             'appid': self.api_key,
@@ -36,28 +98,91 @@ class weatherDashboard:
         }
 
         try:
-            response = requests.get(base_url, params=params)
+            response = self.session.get(base_url, params=params, timeout=self.timeout)
             response.raise_for_status()
-            return response.json()
+            weather_data = response.json()
+            self.cache.put(city.lower(), weather_data)
+            self.cities.register(city, weather_data)
+            return dict(weather_data)
         except requests.exceptions.RequestException as e:
             print(e)
             return None
+    def fetch_weather_group(self, cities):
+        """Fetch several already-resolved cities in one request using their ids.
+
+        Returns a dict of city -> weather data. Cities missing from the
+        response are left out; the whole group is empty if the request fails.
+        """
+        base_url = f'{self.api_url}/group'
+        ids = {self.cities.get(city)['id']: city for city in cities}
+        params = {
+            'id': ','.join(str(city_id) for city_id in ids),
+            'appid': self.api_key,
+            'units': 'metric'
+        }
+
+        try:
+            response = self.session.get(base_url, params=params, timeout=self.timeout)
+            response.raise_for_status()
+            results = {}
+            for weather_data in response.json().get('list', []):
+                city = ids.get(weather_data.get('id'))
+                if city:
+                    self.cache.put(city.lower(), weather_data)
+                    results[city] = dict(weather_data)
+            return results
+        except requests.exceptions.RequestException as e:
+            print(e)
+            return {}
+    def fetch_all(self, cities, max_workers=None):
+        """Fetch weather data for many cities concurrently.
+
+        Cached cities are returned immediately. Cities with a known id are
+        fetched group_size at a time in one request each; the rest are fetched
+        by name and their ids remembered for the next run.
+
+        Yields (city, weather_data, latency) tuples in completion order so
+        callers can start saving results while other requests are in flight.
+        """
+        max_workers = max_workers or self.max_workers
+        resolved, unresolved = [], []
+        for city in cities:
+            cached = self.cache.get(city.lower())
+            if cached is not None:
+                yield city, dict(cached), 0.0
+            elif self.group_size > 1 and self.cities.get(city):
+                resolved.append(city)
+            else:
+                unresolved.append(city)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(self._timed_fetch, city) for city in unresolved]
+            for i in range(0, len(resolved), self.group_size):
+                futures.append(executor.submit(self._timed_fetch_group, resolved[i:i + self.group_size]))
+            for future in as_completed(futures):
+                yield from future.result()
+    def _timed_fetch(self, city):
+        start = time.perf_counter()
+        weather_data = self._fetch_by_name(city)
+        return [(city, weather_data, time.perf_counter() - start)]
+    def _timed_fetch_group(self, cities):
+        start = time.perf_counter()
+        results = self.fetch_weather_group(cities)
+        latency = time.perf_counter() - start
+        fetched = [(city, results[city], latency) for city in cities if city in results]
+        # Fall back to name lookups for anything the group request did not return
+        for city in cities:
+            if city not in results:
+                fetched.extend(self._timed_fetch(city))
+        return fetched
     def save_to_s3(self, weather_data, city):
         """Save weather data to S3 bucket"""
         if not weather_data:
             return False
-            
-        timestamp = datetime.now().strftime('%Y%m%d-%H%M%S')
-        file_name = f"weather-data/{city}-{timestamp}.json"
-        
+
         try:
-            weather_data['timestamp'] = timestamp
-            self.s3.put_object(
-                Bucket=self.bucket_name,
-                Key=file_name,
-                Body=json.dumps(weather_data),
-                ContentType='application/json'
-            )
+            timestamp, body = encode_observation(weather_data)
+            self.s3_sink.write(city, timestamp, body, weather_data)
             print(f"Successfully saved data for {city} to S3")
             return True
         except Exception as e:
@@ -67,35 +192,37 @@ class weatherDashboard:
         """Save weather data to local file"""
         if not weather_data:
             return False
-            
-        timestamp = datetime.now().strftime('%Y%m%d-%H%M%S')
-        directory = "data"
-        file_name = f"{directory}/{city}-{timestamp}.json"
-        
+
         try:
-            weather_data['timestamp'] = timestamp
-            if not os.path.exists(directory):
-                os.makedirs(directory)
-            with open(file_name, 'w') as f:
-                json.dump(weather_data, f)
-            print(f"Successfully saved data for {city} to {file_name}")
+            timestamp, body = encode_observation(weather_data)
+            self.local_sink.write(city, timestamp, body, weather_data)
+            print(f"Successfully saved data for {city} locally")
             return True
         except Exception as e:
-            print(f"Error saving to {file_name}: {e}")
+            print(f"Error saving {city} locally: {e}")
             return False
+    def flush(self):
+        """Wait for queued sink writes and flush buffered sinks. Returns the names of sinks that failed to flush."""
+        return self.pipeline.flush()
         
 
-def main():
+def run():
+    """Fetch every configured city and save the results."""
     dashboard = weatherDashboard()
     
     # Create bucket if needed
     dashboard.create_bucket_if_not_exists()
     
-    cities = ["Fullerton", "Los Angeles", "New York"]
-    
-    for city in cities:
-        print(f"\nFetching weather for {city}...")
-        weather_data = dashboard.fetch_weather_data(city)
+    cities = get_cities()
+
+    latencies = {}
+    failures = []
+    # (city, state entry, sink futures) committed to the ingest state once stored
+    published = []
+    start = time.perf_counter()
+    for city, weather_data, latency in dashboard.fetch_all(cities):
+        latencies[city] = latency
+        print(f"\nFetched weather for {city} in {latency * 1000:.0f} ms")
         if weather_data:
             temp = weather_data['main']['temp']
             feels_like = weather_data['main']['feels_like']
@@ -106,18 +233,112 @@ def main():
             print(f"Feels like: {feels_like}°F")
             print(f"Humidity: {humidity}%")
             print(f"Conditions: {description}")
-            
-            # Save to S3
-            success = dashboard.save_to_s3(weather_data, city)
-            if success:
-                print(f"Weather data for {city} saved to S3!")
-
-            # Save to local file
-            success = dashboard.save_local(weather_data, city)
-            if success:
-                print(f"Weather data for {city} saved to local file!")
+
+            entry = dashboard.state.check(city, weather_data) if dashboard.state else None
+            if dashboard.state and entry is None:
+                print(f"Observation for {city} unchanged since last run, skipping save")
+                continue
+            futures = dashboard.pipeline.publish(weather_data, city)
+            if entry is not None:
+                published.append((city, entry, futures))
         else:
+            failures.append(city)
             print(f"Failed to fetch weather data for {city}")
+    flush_failed = dashboard.flush()
+    if flush_failed:
+        # Buffered observations were not stored; leave them out of the state so the next run stores them
+        print(f"Flushing {', '.join(flush_failed)} failed; observations will be stored again on the next run")
+        published = []
+    for city, entry, futures in published:
+        if not dashboard.state.commit_if_stored(city, entry, futures):
+            print(f"Saving {city} failed; it will be stored again on the next run")
+    elapsed = time.perf_counter() - start
+
+    print(f"\nFetched {len(cities) - len(failures)}/{len(cities)} cities in {elapsed:.2f}s")
+    for city, latency in sorted(latencies.items(), key=lambda item: item[1], reverse=True):
+        print(f"  {city}: {latency * 1000:.0f} ms")
+    if failures:
+        print(f"Failed cities: {', '.join(failures)}")
+
+    for name, sink_stats in dashboard.pipeline.stats().items():
+        print(
+            f"Sink {name}: {sink_stats['writes']} writes, {sink_stats['errors']} errors, "
+            f"mean {sink_stats['mean_latency'] * 1000:.0f} ms, max {sink_stats['max_latency'] * 1000:.0f} ms"
+        )
+
+    if dashboard.state:
+        print(f"Ingest: {dashboard.state.written} observations written, {dashboard.state.skipped} unchanged writes avoided")
+        dashboard.state.save()
+
+    stats = dashboard.cache.stats()
+    print(f"Cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_ratio']:.0%} hit ratio)")
+    dashboard.cache.save()
+    dashboard.cities.save()
+
+def get_cities():
+    cities = os.getenv('WEATHER_CITIES', 'Fullerton,Los Angeles,New York')
+    return [city.strip() for city in cities.split(',') if city.strip()]
+
+def daemon(args):
+    """Poll every configured city on its own adaptive schedule until stopped."""
+    from weather_daemon import WeatherDaemon
+
+    WeatherDaemon(
+        weatherDashboard(),
+        get_cities(),
+        min_interval=args.min_interval,
+        max_interval=args.max_interval,
+    ).run()
+
+def query(args):
+    """Print windowed aggregates over the locally stored history."""
+    # Imported here so fetching does not require numpy
+    from weather_query import WeatherQuery
+
+    dotenv.load_dotenv()
+    history_dir = args.history_dir
+    if history_dir is None and os.getenv('WEATHER_LOCAL_MODE', 'json') == 'columnar':
+        history_dir = os.getenv('WEATHER_HISTORY_DIR', 'data/history')
+
+    start = time.perf_counter()
+    weather_query = WeatherQuery(data_dir=args.data_dir, history_dir=history_dir)
+    rows = weather_query.aggregate(
+        field=args.field,
+        window=args.window,
+        since=timedelta(days=args.days),
+        cities=args.city,
+    )
+    elapsed = time.perf_counter() - start
+
+    print(f"{'City':<20} {'Window':<17} {'Min':>8} {'Max':>8} {'Mean':>8} {'Count':>6}")
+    for row in rows:
+        print(f"{row['city']:<20} {row['window_start']:<17} {row['min']:>8.2f} {row['max']:>8.2f} {row['mean']:>8.2f} {row['count']:>6}")
+    print(f"\n{len(rows)} rows in {elapsed * 1000:.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Weather data collection dashboard")
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.add_parser('run', help="fetch and save weather for all cities (default)")
+
+    daemon_parser = subparsers.add_parser('daemon', help="keep polling cities on adaptive schedules")
+    daemon_parser.add_argument('--min-interval', type=float, default=float(os.getenv('WEATHER_MIN_INTERVAL', '60')), help="shortest seconds between polls of a city")
+    daemon_parser.add_argument('--max-interval', type=float, default=float(os.getenv('WEATHER_MAX_INTERVAL', '1800')), help="longest seconds between polls of a city")
+
+    query_parser = subparsers.add_parser('query', help="aggregate stored weather history")
+    query_parser.add_argument('--field', default='temp', help="temp, feels_like, humidity, pressure, wind_speed or wind_deg")
+    query_parser.add_argument('--window', default='1h', help="aggregation window, e.g. 15m, 1h, 1d")
+    query_parser.add_argument('--days', type=float, default=7, help="how many days back to include")
+    query_parser.add_argument('--city', action='append', help="limit to a city (repeatable)")
+    query_parser.add_argument('--data-dir', default='data', help="directory of per-observation JSON files")
+    query_parser.add_argument('--history-dir', default=None, help="columnar history store to read instead")
+
+    args = parser.parse_args()
+    if args.command == 'query':
+        query(args)
+    elif args.command == 'daemon':
+        daemon(args)
+    else:
+        run()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,179 @@
+import os
+import json
+import bisect
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from history_store import COLUMNS, FILE_NAME_PATTERN, HistoryStore, extract_field
+
+FIELDS = [name for name, (_, path) in COLUMNS.items() if path and name != "dt"]
+
+WINDOW_UNITS = {"m": 60, "h": 3600, "d": 86400}
+
+# File names carry the local fetch time while queries use the upstream dt,
+# so index lookups are widened by this much to cover any clock or zone skew
+LOOKUP_SLACK = 86400
+
+
+def parse_window(window):
+    """Convert a window like '15m', '1h' or '1d' to seconds."""
+    if isinstance(window, (int, float)):
+        return int(window)
+    unit = window[-1].lower()
+    if unit not in WINDOW_UNITS or not window[:-1].isdigit():
+        raise ValueError(f"Invalid window '{window}', expected e.g. 15m, 1h or 1d")
+    return int(window[:-1]) * WINDOW_UNITS[unit]
+
+
+class WeatherIndex:
+    """
+    Index of per-observation JSON files keyed by city and timestamp.
+
+    The index is built from the {city}-{YYYYmmdd-HHMMSS}.json file names, so
+    only files near a queried time range are ever opened. Observations are
+    then filtered and timestamped by their OpenWeather dt (UTC epoch), the
+    same basis as the columnar store. Parsed files are kept in memory since
+    observations are never rewritten.
+    """
+
+    def __init__(self, directory="data"):
+        self.directory = directory
+        self._entries = {}
+        self._parsed = {}
+        self.refresh()
+
+    def refresh(self):
+        """Rescan the data directory for new files."""
+        entries = {}
+        if os.path.exists(self.directory):
+            for file_name in os.listdir(self.directory):
+                match = FILE_NAME_PATTERN.match(file_name)
+                if not match:
+                    continue
+                timestamp = datetime.strptime(match.group("timestamp"), '%Y%m%d-%H%M%S').timestamp()
+                entries.setdefault(match.group("city"), []).append((timestamp, os.path.join(self.directory, file_name)))
+        for city_entries in entries.values():
+            city_entries.sort()
+        self._entries = entries
+
+    def cities(self):
+        return sorted(self._entries)
+
+    def lookup(self, city, start, end):
+        """Return (timestamp, path) pairs for city with start <= timestamp < end."""
+        city_entries = self._entries.get(city, [])
+        low = bisect.bisect_left(city_entries, (start, ""))
+        high = bisect.bisect_left(city_entries, (end, ""))
+        return city_entries[low:high]
+
+    def _read(self, path):
+        values = self._parsed.get(path)
+        if values is None:
+            try:
+                with open(path) as f:
+                    weather_data = json.load(f)
+            except (OSError, ValueError):
+                weather_data = {}
+            values = {name: extract_field(weather_data, COLUMNS[name][1], name) for name in FIELDS + ["dt"]}
+            self._parsed[path] = values
+        return values
+
+    def load(self, field, start, end, cities=None):
+        """Return (city_ids, timestamps, values, city_names) arrays for the range."""
+        city_names = cities or self.cities()
+        city_ids, timestamps, values = [], [], []
+        for city_id, city in enumerate(city_names):
+            for _, path in self.lookup(city, start - LOOKUP_SLACK, end + LOOKUP_SLACK):
+                observation = self._read(path)
+                if not start <= observation["dt"] < end:
+                    continue
+                city_ids.append(city_id)
+                timestamps.append(observation["dt"])
+                values.append(observation[field])
+        return (
+            np.array(city_ids, dtype=np.int64),
+            np.array(timestamps, dtype=np.float64),
+            np.array(values, dtype=np.float64),
+            city_names,
+        )
+
+
+class WeatherQuery:
+    """
+    Windowed aggregates over stored observations.
+
+    Reads the columnar history store when history_dir exists, otherwise
+    the per-observation JSON files in data_dir. Either way observations are
+    placed by their OpenWeather dt (UTC epoch) and windows are printed in
+    local time.
+    """
+
+    def __init__(self, data_dir="data", history_dir=None):
+        self.history = None
+        self.index = None
+        if history_dir and os.path.exists(history_dir):
+            self.history = HistoryStore(history_dir)
+        else:
+            self.index = WeatherIndex(data_dir)
+
+    def _load(self, field, start, end, cities):
+        if self.index is not None:
+            self.index.refresh()
+            return self.index.load(field, start, end, cities)
+
+        columns = self.history.columns()
+        names = self.history.cities()
+        city_ids = np.asarray(columns["city"], dtype=np.int64)
+        timestamps = np.asarray(columns["dt"], dtype=np.float64)
+        values = np.asarray(columns[field], dtype=np.float64)
+        mask = (timestamps >= start) & (timestamps < end)
+        if cities:
+            wanted = [names.index(city) for city in cities if city in names]
+            mask &= np.isin(city_ids, wanted)
+        return city_ids[mask], timestamps[mask], values[mask], names
+
+    def aggregate(self, field="temp", window="1h", since=timedelta(days=7), cities=None, end=None):
+        """
+        Return min/max/mean/count of field per city per window.
+
+        Rows are dicts sorted by city then window start. Missing readings are
+        ignored in min/max/mean but still counted in count.
+        """
+        if field not in FIELDS:
+            raise ValueError(f"Unknown field '{field}', expected one of {', '.join(FIELDS)}")
+        window = parse_window(window)
+        end = end or datetime.now()
+        start = end - since
+        city_ids, timestamps, values, names = self._load(field, start.timestamp(), end.timestamp(), cities)
+        if not len(values):
+            return []
+
+        buckets = (timestamps // window).astype(np.int64) * window
+        order = np.lexsort((buckets, city_ids))
+        city_ids, buckets, values = city_ids[order], buckets[order], values[order]
+
+        # Group boundaries: wherever the city or the window changes
+        changed = (np.diff(city_ids) != 0) | (np.diff(buckets) != 0)
+        starts = np.concatenate(([0], np.flatnonzero(changed) + 1))
+        counts = np.diff(np.append(starts, len(values)))
+
+        valid = ~np.isnan(values)
+        sums = np.add.reduceat(np.where(valid, values, 0.0), starts)
+        valid_counts = np.add.reduceat(valid.astype(np.int64), starts)
+        mins = np.fmin.reduceat(values, starts)
+        maxs = np.fmax.reduceat(values, starts)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = sums / valid_counts
+
+        return [
+            {
+                "city": names[city_ids[i]],
+                "window_start": datetime.fromtimestamp(buckets[i]).strftime('%Y-%m-%d %H:%M'),
+                "min": float(low),
+                "max": float(high),
+                "mean": float(mean),
+                "count": int(count),
+            }
+            for i, low, high, mean, count in zip(starts, mins, maxs, means, counts)
+        ]